@@ -31,13 +31,72 @@ Or use the helper script:
 """
 
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, current_timestamp, to_timestamp
+from pyspark.sql.functions import col, current_timestamp, lit, to_json, to_timestamp
+from pyspark.sql.types import (
+    DoubleType, IntegerType, LongType, StringType, TimestampType
+)
+
+# Silver metadata files. Files written since significant_datasets became a
+# native list<struct> live under v2/ so they are never scanned together with
+# the legacy files that store it as a JSON string.
+SILVER_METADATA_PATH = "s3a://lakehouse/silver/hdf5_metadata"
+LEGACY_METADATA_GLOB = f"{SILVER_METADATA_PATH}/*.parquet"
+NESTED_METADATA_GLOB = f"{SILVER_METADATA_PATH}/v2/*.parquet"
+
+# Target columns of nessie.scientific_data.hdf5_catalog, in table order
+CATALOG_COLUMNS = [
+    ("file_path", StringType()),
+    ("file_name", StringType()),
+    ("file_size_bytes", LongType()),
+    ("file_modified_time", StringType()),
+    ("file_created_time", StringType()),
+    ("ingestion_time", TimestampType()),
+    ("tiled_uri", StringType()),
+    ("tiled_adapter", StringType()),
+    ("content_type", StringType()),
+    ("hdf5_driver", StringType()),
+    ("hdf5_libver", StringType()),
+    ("group_count", IntegerType()),
+    ("dataset_count", IntegerType()),
+    ("significant_datasets", StringType()),
+    ("entry_name", StringType()),
+    ("title", StringType()),
+    ("experiment_identifier", StringType()),
+    ("start_time", StringType()),
+    ("end_time", StringType()),
+    ("duration", DoubleType()),
+    ("run_number", StringType()),
+    ("instrument_name", StringType()),
+    ("instrument_type", StringType()),
+    ("source_name", StringType()),
+    ("source_type", StringType()),
+    ("sample_name", StringType()),
+    ("sample_description", StringType()),
+    ("user_name", StringType()),
+    ("user_facility", StringType()),
+    ("extraction_error", StringType()),
+    ("s3_uri", StringType()),
+    ("cataloged_at", TimestampType()),
+]
 
 
 def create_spark_session():
     """Create Spark session with Iceberg and Nessie configuration."""
     return SparkSession.builder \
         .appName("HDF5_Catalog_Bridge") \
+        .config("spark.sql.sources.parallelPartitionDiscovery.threshold", "1") \
+        .config("spark.sql.sources.parallelPartitionDiscovery.parallelism", "64") \
+        .config("spark.sql.sources.v2.bucketing.enabled", "true") \
+        .config("spark.sql.iceberg.planning.preserve-data-grouping", "true") \
+        .config("spark.sql.join.preferSortMergeJoin", "false") \
+        .config("spark.hadoop.fs.s3a.connection.maximum", "200") \
+        .config("spark.hadoop.fs.s3a.threads.max", "64") \
+        .config("spark.hadoop.fs.s3a.experimental.input.fadvise", "random") \
+        .config("spark.hadoop.fs.s3a.readahead.range", "1M") \
+        .config("spark.sql.parquet.enableVectorizedReader", "true") \
+        .config("spark.sql.parquet.filterPushdown", "true") \
+        .config("spark.sql.parquet.aggregatePushdown", "true") \
+        .config("spark.sql.iceberg.vectorization.enabled", "true") \
         .getOrCreate()
 
 
@@ -86,80 +145,92 @@ def create_hdf5_catalog_table(spark):
         ) USING iceberg
         PARTITIONED BY (instrument_name)
     """)
+    
+    # Cluster rows by instrument and recency so start_time min/max stats
+    # prune files, and hash-distribute writes on the partition key so MERGE
+    # tasks are not skewed
+    spark.sql("""
+        ALTER TABLE nessie.scientific_data.hdf5_catalog
+        WRITE DISTRIBUTED BY PARTITION
+        LOCALLY ORDERED BY instrument_name, start_time DESC
+    """)
+    
+    # Merge-on-read: MERGE writes small delete files instead of rewriting
+    # every data file touched by a matched row (see compact_iceberg.py).
+    # 128 MB target files with 32 MB row groups keep MERGE output from
+    # fragmenting into many small files.
+    spark.sql("""
+        ALTER TABLE nessie.scientific_data.hdf5_catalog SET TBLPROPERTIES (
+            'format-version' = '2',
+            'write.merge.mode' = 'merge-on-read',
+            'write.update.mode' = 'merge-on-read',
+            'write.delete.mode' = 'merge-on-read',
+            'write.spark.fanout.enabled' = 'true',
+            'write.target-file-size-bytes' = '134217728',
+            'write.parquet.row-group-size-bytes' = '33554432',
+            'write.parquet.compression-codec' = 'zstd',
+            'write.distribution-mode' = 'hash'
+        )
+    """)
     print("✓ Table 'nessie.scientific_data.hdf5_catalog' ready")
 
 
 def read_hdf5_metadata(spark):
-    """Read HDF5 metadata Parquet files from the silver layer."""
-    metadata_path = "s3a://lakehouse/silver/hdf5_metadata/*.parquet"
-    
-    try:
-        df = spark.read.parquet(metadata_path)
-        count = df.count()
-        print(f"✓ Read {count} HDF5 metadata records from silver layer")
-        return df
-    except Exception as e:
-        print(f"⚠ Error reading HDF5 metadata: {e}")
+    """
+    Read HDF5 metadata Parquet files from the silver layer.
+    
+    Legacy and v2 files are read separately, since Spark cannot reconcile a
+    STRING and a list<struct> significant_datasets column within one scan.
+    The nested column is serialized with to_json before the two are unioned.
+    """
+    frames = []
+    for metadata_path in (LEGACY_METADATA_GLOB, NESTED_METADATA_GLOB):
+        try:
+            df = spark.read.parquet(metadata_path)
+        except Exception as e:
+            print(f"  No metadata at {metadata_path} ({type(e).__name__})")
+            continue
+        if "significant_datasets" in df.columns and \
+                not isinstance(df.schema["significant_datasets"].dataType, StringType):
+            # The catalog keeps significant_datasets as a JSON string
+            df = df.withColumn("significant_datasets", to_json(col("significant_datasets")))
+        frames.append(df)
+    
+    if not frames:
+        print("⚠ Error reading HDF5 metadata: no Parquet files in the silver layer")
         print("  Make sure ingest_hdf5.py has been run with --upload-metadata first.")
         return None
+    
+    df = frames[0]
+    for other in frames[1:]:
+        df = df.unionByName(other, allowMissingColumns=True)
+    print("✓ Read HDF5 metadata from silver layer")
+    return df
 
 
 def merge_into_iceberg(spark, df_source):
     """Merge source data into Iceberg table using UPSERT logic."""
-    from pyspark.sql.functions import lit, when
-    from pyspark.sql.types import LongType, IntegerType, DoubleType, StringType
-    
-    # Add cataloged_at timestamp
-    df_prepared = df_source.withColumn("cataloged_at", current_timestamp())
-    
-    # Cast columns to expected types to handle type mismatches
-    type_casts = {
-        "file_size_bytes": LongType(),
-        "group_count": IntegerType(),
-        "dataset_count": IntegerType(),
-        "duration": DoubleType(),
-    }
-    
-    for col_name, col_type in type_casts.items():
-        if col_name in df_prepared.columns:
-            df_prepared = df_prepared.withColumn(col_name, col(col_name).cast(col_type))
-    
-    # Convert string timestamps
-    if "ingestion_time" in df_prepared.columns:
-        df_prepared = df_prepared.withColumn("ingestion_time", to_timestamp(col("ingestion_time")))
-    
-    # Ensure all string columns are actually strings (not arrays)
-    string_columns = [
-        "file_path", "file_name", "file_modified_time", "file_created_time",
-        "tiled_uri", "tiled_adapter", "content_type", "hdf5_driver", "hdf5_libver",
-        "significant_datasets", "entry_name", "title", "experiment_identifier",
-        "start_time", "end_time", "run_number", "instrument_name", "instrument_type",
-        "source_name", "source_type", "sample_name", "sample_description",
-        "user_name", "user_facility", "extraction_error", "s3_uri"
-    ]
-    
-    for col_name in string_columns:
-        if col_name in df_prepared.columns:
-            df_prepared = df_prepared.withColumn(col_name, col(col_name).cast(StringType()))
-    
-    # Fill missing columns with nulls
-    expected_columns = [
-        "file_path", "file_name", "file_size_bytes", "file_modified_time",
-        "file_created_time", "ingestion_time", "tiled_uri", "tiled_adapter",
-        "content_type", "hdf5_driver", "hdf5_libver", "group_count",
-        "dataset_count", "significant_datasets", "entry_name", "title",
-        "experiment_identifier", "start_time", "end_time", "duration",
-        "run_number", "instrument_name", "instrument_type", "source_name",
-        "source_type", "sample_name", "sample_description", "user_name",
-        "user_facility", "extraction_error", "s3_uri", "cataloged_at"
-    ]
-    
-    for col_name in expected_columns:
-        if col_name not in df_prepared.columns:
-            df_prepared = df_prepared.withColumn(col_name, lit(None))
-    
-    # Select only expected columns in order
-    df_prepared = df_prepared.select(*expected_columns)
+    # Build every cast / fill in one projection so Catalyst analyzes a single
+    # Project node instead of one per withColumn call
+    source_columns = set(df_source.columns)
+    exprs = []
+    for col_name, col_type in CATALOG_COLUMNS:
+        if col_name == "cataloged_at":
+            expr = current_timestamp()
+        elif col_name not in source_columns:
+            # Fill missing columns with nulls
+            expr = lit(None).cast(col_type)
+        elif col_name == "ingestion_time":
+            # Convert string timestamps
+            expr = to_timestamp(col(col_name))
+        else:
+            # Cast to expected types (also turns stray arrays into strings)
+            expr = col(col_name).cast(col_type)
+        exprs.append(expr.alias(col_name))
+    
+    # Spread the MERGE source evenly over the merge key so no task is skewed
+    df_prepared = df_source.select(*exprs) \
+        .repartition(spark.sparkContext.defaultParallelism, col("file_path"))
     
     # Register source as temp view
     df_prepared.createOrReplaceTempView("hdf5_source")
@@ -198,7 +269,7 @@ def show_catalog_summary(spark):
         ORDER BY file_count DESC
     """).show(truncate=False)
     
-    # Recent files
+    # Recent files (time bound lets Iceberg skip files by cataloged_at min/max stats)
     print("\nRecent Files:")
     spark.sql("""
         SELECT 
@@ -207,6 +278,7 @@ def show_catalog_summary(spark):
             title,
             cataloged_at
         FROM nessie.scientific_data.hdf5_catalog
+        WHERE cataloged_at > current_timestamp() - INTERVAL 7 DAYS
         ORDER BY cataloged_at DESC
         LIMIT 5
     """).show(truncate=False)
@@ -231,7 +303,8 @@ def main():
     # Read metadata from silver layer
     df_metadata = read_hdf5_metadata(spark)
     
-    if df_metadata is None or df_metadata.count() == 0:
+    # take(1) stops at the first row instead of scanning every file
+    if df_metadata is None or not df_metadata.take(1):
         print("\n⚠ No HDF5 metadata found in silver layer.")
         print("  Run ingest_hdf5.py with --upload-metadata first:")
         print("  python scripts/ingest_hdf5.py /path/to/files --upload-metadata")
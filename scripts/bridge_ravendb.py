@@ -23,12 +23,32 @@ Run this inside the Spark container:
 """
 
 from pyspark.sql import SparkSession
+from pyspark.sql.functions import col, explode, input_file_name, lit
+from pyspark.sql.utils import AnalysisException
+
+# Must match the bucket(N, OrderId) transform in the table DDL
+ORDER_BUCKETS = 16
+
+BUCKET_URI = "s3a://lakehouse"
+LANDING_PATH = f"{BUCKET_URI}/silver/ravendb_landing/orders/partition_date=*/*.parquet"
+# Written by ravendb_sync.py, one per sync run
+MANIFEST_PATH = f"{BUCKET_URI}/silver/ravendb_landing/_manifests/orders/*.json"
 
 
 def create_spark_session():
     """Create Spark session with Iceberg and Nessie configuration."""
     return SparkSession.builder \
         .appName("RavenDB_Bridge") \
+        .config("spark.sql.sources.parallelPartitionDiscovery.threshold", "1") \
+        .config("spark.sql.sources.parallelPartitionDiscovery.parallelism", "64") \
+        .config("spark.sql.sources.v2.bucketing.enabled", "true") \
+        .config("spark.sql.iceberg.planning.preserve-data-grouping", "true") \
+        .config("spark.sql.join.preferSortMergeJoin", "false") \
+        .config("spark.hadoop.fs.s3a.connection.maximum", "200") \
+        .config("spark.hadoop.fs.s3a.threads.max", "64") \
+        .config("spark.hadoop.fs.s3a.experimental.input.fadvise", "random") \
+        .config("spark.hadoop.fs.s3a.readahead.range", "1M") \
+        .config("spark.sql.parquet.enableVectorizedReader", "true") \
         .getOrCreate()
 
 
@@ -40,7 +60,8 @@ def create_namespace_if_not_exists(spark):
 
 def create_orders_table(spark):
     """Create the Iceberg orders table if it doesn't exist."""
-    spark.sql("""
+    # Bucketing on the MERGE key lets both sides of the MERGE be co-partitioned
+    spark.sql(f"""
         CREATE TABLE IF NOT EXISTS nessie.structured_data.orders (
             OrderId STRING,
             CustomerId STRING,
@@ -52,19 +73,71 @@ def create_orders_table(spark):
             LineCount INT,
             SyncedAt TIMESTAMP
         ) USING iceberg
-        PARTITIONED BY (days(OrderDate))
+        PARTITIONED BY (bucket({ORDER_BUCKETS}, OrderId), days(OrderDate))
+    """)
+    
+    # Merge-on-read: MERGE writes small delete files instead of rewriting
+    # every data file touched by a matched row (see compact_iceberg.py).
+    # 128 MB target files with 32 MB row groups keep MERGE output from
+    # fragmenting into many small files.
+    spark.sql("""
+        ALTER TABLE nessie.structured_data.orders SET TBLPROPERTIES (
+            'format-version' = '2',
+            'write.merge.mode' = 'merge-on-read',
+            'write.update.mode' = 'merge-on-read',
+            'write.delete.mode' = 'merge-on-read',
+            'write.target-file-size-bytes' = '134217728',
+            'write.parquet.row-group-size-bytes' = '33554432',
+            'write.parquet.compression-codec' = 'zstd',
+            'write.distribution-mode' = 'hash'
+        )
     """)
     print("✓ Table 'nessie.structured_data.orders' ready")
 
 
-def read_landing_zone(spark):
-    """Read raw Parquet files from the RavenDB landing zone."""
-    landing_path = "s3a://lakehouse/silver/ravendb_landing/orders/*/*.parquet"
+def read_sync_manifests(spark):
+    """
+    Collect the landing files announced by ravendb_sync.py manifests.
     
+    Returns (manifest_paths, landing_paths). Both are empty when no manifests
+    are pending, e.g. on a cold start or when RavenDB OLAP ETL is the producer.
+    """
     try:
-        df = spark.read.parquet(landing_path)
-        count = df.count()
-        print(f"✓ Read {count} records from landing zone")
+        rows = spark.read.option("multiLine", "true").json(MANIFEST_PATH) \
+            .select(input_file_name().alias("manifest"), explode("files").alias("key")) \
+            .collect()
+    except AnalysisException:
+        return [], []
+    
+    manifest_paths = sorted({row["manifest"] for row in rows})
+    landing_paths = sorted({f"{BUCKET_URI}/{row['key']}" for row in rows})
+    return manifest_paths, landing_paths
+
+
+def delete_manifests(spark, manifest_paths):
+    """Remove consumed manifests once their files have been merged."""
+    jvm = spark._jvm
+    hadoop_conf = spark._jsc.hadoopConfiguration()
+    for manifest in manifest_paths:
+        path = jvm.org.apache.hadoop.fs.Path(manifest)
+        path.getFileSystem(hadoop_conf).delete(path, False)
+    print(f"✓ Consumed {len(manifest_paths)} sync manifest(s)")
+
+
+def read_landing_zone(spark, landing_paths=None):
+    """
+    Read raw Parquet files from the RavenDB landing zone.
+    
+    When `landing_paths` is given only those files are read; otherwise the
+    whole landing zone is listed.
+    """
+    try:
+        if landing_paths:
+            df = spark.read.parquet(*landing_paths)
+            print(f"✓ Read {len(landing_paths)} new file(s) from landing zone")
+        else:
+            df = spark.read.parquet(LANDING_PATH)
+            print("✓ Read landing zone")
         return df
     except Exception as e:
         print(f"⚠ Error reading landing zone: {e}")
@@ -72,8 +145,26 @@ def read_landing_zone(spark):
         return None
 
 
+def filter_new_records(spark, df_source):
+    """
+    Keep only landing-zone rows synced after the last MERGE.
+    
+    Uses MAX(SyncedAt) of the target table as a high-water mark, so the MERGE
+    source (and the rows it rewrites or deletes) only covers new syncs.
+    """
+    hwm = spark.sql("""
+        SELECT COALESCE(MAX(SyncedAt), TIMESTAMP '1970-01-01 00:00:00') AS hwm
+        FROM nessie.structured_data.orders
+    """).collect()[0]["hwm"]
+    print(f"✓ High-water mark: SyncedAt > {hwm}")
+    return df_source.filter(col("SyncedAt") > lit(hwm))
+
+
 def merge_into_iceberg(spark, df_source):
     """Merge source data into Iceberg table using UPSERT logic."""
+    # Pre-bucket the source on the merge key to match the table layout
+    df_source = df_source.repartition(ORDER_BUCKETS, col("OrderId"))
+    
     # Register source as temp view
     df_source.createOrReplaceTempView("source_updates")
     
@@ -149,15 +240,26 @@ def main():
     
     # Read from landing zone
     print("\nReading from landing zone...")
-    df_source = read_landing_zone(spark)
+    manifest_paths, landing_paths = read_sync_manifests(spark)
+    if not manifest_paths:
+        print("  No pending sync manifests, listing the full landing zone")
+    df_source = read_landing_zone(spark, landing_paths)
+    if df_source is not None:
+        df_source = filter_new_records(spark, df_source)
     
-    if df_source is None:
+    # take(1) stops at the first row instead of scanning every file
+    if df_source is None or not df_source.take(1):
+        print("\n⚠ No new records found in landing zone.")
+        if manifest_paths:
+            delete_manifests(spark, manifest_paths)
         spark.stop()
         return
     
     # Perform merge
     print("\nMerging into Iceberg table...")
     merge_into_iceberg(spark, df_source)
+    if manifest_paths:
+        delete_manifests(spark, manifest_paths)
     
     # Show stats
     show_table_stats(spark)
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Maintenance Job: Compact the merge-on-read Iceberg tables.
+
+The bridge jobs MERGE into merge-on-read tables, so each run adds small data
+files plus position delete files instead of rewriting existing data. This job
+rewrites them back into larger files so read-side cost stays bounded.
+Schedule it periodically (e.g. nightly via cron).
+
+Run this inside the Spark container (see bridge_ravendb.py for full command),
+or use the helper script:
+  ./run_spark.sh compact_iceberg.py
+"""
+
+from pyspark.sql import SparkSession
+
+# Tables written with MERGE by the bridge and embedding jobs
+TABLES = [
+    "structured_data.orders",
+    "scientific_data.hdf5_catalog",
+    "gold.order_embeddings",
+]
+
+
+def create_spark_session():
+    """Create Spark session with Iceberg and Nessie configuration."""
+    return SparkSession.builder \
+        .appName("Iceberg_Compaction") \
+        .getOrCreate()
+
+
+def compact_table(spark, table):
+    """Rewrite small data files and fold position deletes into new files."""
+    result = spark.sql(f"""
+        CALL nessie.system.rewrite_data_files(
+            table => '{table}',
+            options => map('min-input-files', '5')
+        )
+    """).collect()[0]
+    print(f"  ✓ Rewrote {result['rewritten_data_files_count']} data files "
+          f"into {result['added_data_files_count']}")
+
+    result = spark.sql(f"""
+        CALL nessie.system.rewrite_position_delete_files(
+            table => '{table}'
+        )
+    """).collect()[0]
+    print(f"  ✓ Rewrote {result['rewritten_delete_files_count']} delete files "
+          f"into {result['added_delete_files_count']}")
+
+
+def main():
+    print("=" * 60)
+    print("Iceberg Compaction")
+    print("=" * 60)
+
+    # Create Spark session
+    print("\nInitializing Spark session...")
+    spark = create_spark_session()
+
+    for table in TABLES:
+        print(f"\nCompacting nessie.{table}...")
+        if not spark.catalog.tableExists(f"nessie.{table}"):
+            print("  ⚠ Table not found, skipping")
+            continue
+        compact_table(spark, table)
+
+    print("\n" + "=" * 60)
+    print("✓ Compaction complete!")
+    print("=" * 60)
+
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,16 @@ Generate Vector Embeddings from Order Data.
 
 This script reads order data from Iceberg, generates embeddings using a local
 sentence-transformer model, and writes the vectors to both:
-1. Iceberg gold layer (source of truth)
-2. Parquet files for Milvus bulk import
+1. Iceberg gold layer (source of truth, float32)
+2. Parquet files for Milvus bulk import (int8-quantized)
+
+Embeddings are incremental: each order's text is hashed, and only orders whose
+(order_id, text_hash) pair is not already in the gold layer are re-encoded.
 
 For desktop demo, we use the lightweight 'all-MiniLM-L6-v2' model (384 dimensions).
 
 Prerequisites:
-  pip install sentence-transformers pandas pyarrow boto3
+  pip install sentence-transformers pyarrow boto3 s3fs
 
 Usage (standalone, not in Spark):
   python generate_embeddings.py
@@ -18,13 +21,18 @@ Usage (standalone, not in Spark):
 
 import os
 import io
-from typing import List, Dict, Any
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
 
 import boto3
 from botocore.client import Config
-import pandas as pd
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
 import pyarrow.parquet as pq
+import s3fs
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -39,12 +47,31 @@ BUCKET_NAME = "lakehouse"
 # Embedding model config
 MODEL_NAME = "all-MiniLM-L6-v2"  # 384 dimensions, fast
 EMBEDDING_DIM = 384
+EMBEDDING_BATCH_SIZE = 256
+# Local copy of the model; saved on first run so later runs skip the hub
+MODEL_PATH = os.getenv('EMBEDDING_MODEL_PATH', f'/opt/models/{MODEL_NAME}')
+# Optional int8 ONNX export of the model; used instead of PyTorch when present
+ONNX_MODEL_PATH = os.getenv('EMBEDDING_ONNX_PATH', f'/opt/models/{MODEL_NAME}-onnx-int8')
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 truncation length
 
 # Paths
 ORDERS_LANDING = "silver/ravendb_landing/orders"
 VECTORS_OUTPUT = "gold/vectors/orders"
 MILVUS_IMPORT = "gold/milvus_import"
 
+# Gold-layer vector rows (partitioned by ingest_date)
+GOLD_VECTOR_SCHEMA = pa.schema([
+    ('order_id', pa.string()),
+    ('text_hash', pa.int64()),
+    ('vector', pa.list_(pa.float32(), EMBEDDING_DIM)),
+])
+
+# Landing-zone columns used to build the embedding text
+ORDER_COLUMNS = [
+    "OrderId", "CustomerId", "Status", "TotalAmount",
+    "ShipCity", "ShipCountry", "LineCount",
+]
+
 
 def create_s3_client():
     """Create a boto3 S3 client configured for MinIO."""
@@ -58,8 +85,86 @@ def create_s3_client():
     )
 
 
+def create_s3_filesystem() -> s3fs.S3FileSystem:
+    """Create an fsspec S3 filesystem configured for MinIO (used by pyarrow)."""
+    return s3fs.S3FileSystem(
+        key=MINIO_ACCESS_KEY,
+        secret=MINIO_SECRET_KEY,
+        client_kwargs={'endpoint_url': MINIO_ENDPOINT, 'region_name': 'us-east-1'},
+    )
+
+
+class OnnxEmbeddingModel:
+    """
+    MiniLM encoder served by ONNX Runtime.
+    
+    Create the int8 model once with:
+      optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 \\
+          --task feature-extraction onnx_minilm/
+      optimum-cli onnxruntime quantize --onnx_model onnx_minilm --avx512_vnni \\
+          -o /opt/models/all-MiniLM-L6-v2-onnx-int8/
+    
+    `encode` mirrors the SentenceTransformer.encode arguments used here
+    (mean pooling + optional L2 normalization).
+    """
+    
+    def __init__(self, model_dir: str):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        
+        self.session = ort.InferenceSession(
+            find_onnx_model(model_dir),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir, use_fast=True)
+    
+    def encode(self, texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+               normalize_embeddings: bool = True, **kwargs) -> np.ndarray:
+        embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            tokens = self.tokenizer(
+                batch, padding=True, truncation=True,
+                max_length=MAX_SEQ_LENGTH, return_tensors="np",
+            )
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.input_names}
+            hidden = self.session.run(None, feeds)[0]
+            
+            # Mean pooling over non-padding tokens
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            if normalize_embeddings:
+                pooled /= np.linalg.norm(pooled, axis=1, keepdims=True)
+            embeddings[start:start + len(batch)] = pooled
+        return embeddings
+
+
+def find_onnx_model(model_dir: str) -> Optional[str]:
+    """Return the ONNX model file in `model_dir`, preferring the quantized one."""
+    for name in ("model_quantized.onnx", "model.onnx"):
+        path = os.path.join(model_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
 def load_embedding_model():
-    """Load the sentence-transformer model."""
+    """Load the ONNX Runtime encoder if exported, else the sentence-transformer model."""
+    if find_onnx_model(ONNX_MODEL_PATH):
+        print(f"Loading embedding model: {ONNX_MODEL_PATH}")
+        try:
+            model = OnnxEmbeddingModel(ONNX_MODEL_PATH)
+            print(f"  ✓ Model loaded (dimension: {EMBEDDING_DIM}, device: onnxruntime-cpu)")
+            return model
+        except ImportError as e:
+            print(f"  ⚠ ONNX model found but {e.name} is not installed, using PyTorch")
+    
     try:
         from sentence_transformers import SentenceTransformer
     except ImportError:
@@ -68,135 +173,301 @@ def load_embedding_model():
         subprocess.check_call(["pip", "install", "sentence-transformers"])
         from sentence_transformers import SentenceTransformer
     
-    print(f"Loading embedding model: {MODEL_NAME}")
-    model = SentenceTransformer(MODEL_NAME)
-    print(f"  ✓ Model loaded (dimension: {EMBEDDING_DIM})")
+    import torch
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    
+    if os.path.isdir(MODEL_PATH):
+        print(f"Loading embedding model: {MODEL_PATH}")
+        model = SentenceTransformer(MODEL_PATH, device=device)
+    else:
+        print(f"Loading embedding model: {MODEL_NAME}")
+        model = SentenceTransformer(MODEL_NAME, device=device)
+        try:
+            model.save(MODEL_PATH)
+            print(f"  ✓ Saved model to {MODEL_PATH}")
+        except OSError as e:
+            print(f"  ⚠ Could not save model to {MODEL_PATH}: {e}")
+    if device == "cuda":
+        # Half precision doubles GPU throughput with no practical recall loss
+        model.half()
+    print(f"  ✓ Model loaded (dimension: {EMBEDDING_DIM}, device: {device})")
     return model
 
 
-def read_orders_from_landing(s3_client) -> pd.DataFrame:
-    """Read order data from the landing zone Parquet files."""
-    print("\nReading orders from landing zone...")
+def read_orders_from_landing(fs: s3fs.S3FileSystem) -> pa.Table:
+    """
+    Read order data from the landing zone Parquet files.
     
-    # List all Parquet files
-    response = s3_client.list_objects_v2(
-        Bucket=BUCKET_NAME,
-        Prefix=ORDERS_LANDING
-    )
+    Uses a pyarrow dataset over the partition files so the per-file reads
+    are issued concurrently by Arrow's IO thread pool.
+    
+    Unlike bridge_ravendb.py this lists the whole landing zone rather than
+    reading sync manifests: the Milvus import file is a full snapshot of every
+    order, and the bridge deletes manifests once it has consumed them.
+    """
+    print("\nReading orders from landing zone...")
     
-    parquet_files = [
-        obj['Key'] for obj in response.get('Contents', [])
-        if obj['Key'].endswith('.parquet')
-    ]
+    # Only the Hive-partitioned layout; legacy {date}/data.parquet files would
+    # duplicate every order
+    files = fs.glob(f"{BUCKET_NAME}/{ORDERS_LANDING}/partition_date=*/*.parquet")
+    dataset = ds.dataset(files, format="parquet", filesystem=fs) if files else None
     
-    if not parquet_files:
+    if dataset is None or not dataset.files:
         raise ValueError(f"No Parquet files found in {ORDERS_LANDING}/")
     
-    print(f"  ✓ Found {len(parquet_files)} Parquet files")
+    print(f"  ✓ Found {len(dataset.files)} Parquet files")
     
-    # Read and concatenate all files
-    dfs = []
-    for key in parquet_files:
-        obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=key)
-        df = pd.read_parquet(io.BytesIO(obj['Body'].read()))
-        dfs.append(df)
+    # Only decode the columns needed for the embedding text; the result
+    # stays in Arrow (chunked per file, no concatenation copy)
+    table = dataset.to_table(columns=ORDER_COLUMNS, use_threads=True)
+    print(f"  ✓ Loaded {table.num_rows} orders")
+    return table
+
+
+def format_amounts(amounts: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Format dollar amounts rounded to cents using Arrow kernels.
+    
+    Non-finite values (nan, inf) are passed through as Arrow's string form.
+    """
+    amounts = pc.fill_null(amounts, 0.0)
+    finite = pc.is_finite(amounts)
+    # Zero out nan/inf so the integer cast cannot fail; they are restored below
+    cents = pc.cast(pc.round(pc.multiply(pc.if_else(finite, amounts, 0.0), 100.0)), pa.int64())
+    abs_cents = pc.abs(cents)
+    dollars = pc.divide(abs_cents, 100)
+    remainder = pc.subtract(abs_cents, pc.multiply(dollars, 100))
     
-    df_all = pd.concat(dfs, ignore_index=True)
-    print(f"  ✓ Loaded {len(df_all)} orders")
-    return df_all
+    formatted = pc.binary_join_element_wise(
+        pc.cast(dollars, pa.string()),
+        pc.utf8_lpad(pc.cast(remainder, pa.string()), width=2, padding='0'),
+        '.',
+    )
+    formatted = pc.if_else(
+        pc.less(cents, 0),
+        pc.binary_join_element_wise('-', formatted, ''),
+        formatted,
+    )
+    return pc.if_else(finite, formatted, pc.cast(amounts, pa.string()))
 
 
-def create_text_for_embedding(row: pd.Series) -> str:
+def create_texts_for_embedding(table: pa.Table) -> List[str]:
     """
-    Create a text representation of an order for embedding.
+    Create text representations of all orders for embedding.
     
-    Combines multiple fields to create a semantic representation.
+    Combines multiple fields to create a semantic representation. Built from
+    whole Arrow columns with compute kernels rather than row by row.
     """
-    parts = [
-        f"Order {row.get('OrderId', 'unknown')}",
-        f"Customer: {row.get('CustomerId', 'unknown')}",
-        f"Status: {row.get('Status', 'unknown')}",
-        f"Amount: ${row.get('TotalAmount', 0):.2f}",
-        f"Ship to: {row.get('ShipCity', 'unknown')}, {row.get('ShipCountry', 'unknown')}",
-        f"Items: {row.get('LineCount', 0)} line items",
-    ]
-    return ". ".join(parts)
+    def text_col(name: str) -> pa.ChunkedArray:
+        return pc.fill_null(pc.cast(table[name], pa.string()), 'unknown')
+    
+    line_counts = pc.cast(pc.fill_null(table['LineCount'], 0), pa.string())
+    
+    texts = pc.binary_join_element_wise(
+        "Order ", text_col('OrderId'),
+        ". Customer: ", text_col('CustomerId'),
+        ". Status: ", text_col('Status'),
+        ". Amount: $", format_amounts(table['TotalAmount']),
+        ". Ship to: ", text_col('ShipCity'), ", ", text_col('ShipCountry'),
+        ". Items: ", line_counts, " line items",
+        '',  # separator
+    )
+    return texts.to_pylist()
 
 
-def generate_embeddings(model, df: pd.DataFrame) -> pd.DataFrame:
-    """Generate embeddings for all orders."""
+def hash_texts(texts: List[str]) -> pa.Array:
+    """Hash embedding texts to stable 64-bit integers for change detection."""
+    return pa.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(),
+                'little',
+                signed=True,
+            )
+            for text in texts
+        ],
+        type=pa.int64(),
+    )
+
+
+def read_existing_vectors(fs: s3fs.S3FileSystem) -> Optional[pa.Table]:
+    """Read previously generated (order_id, text_hash, vector) rows from the gold layer."""
+    files = fs.glob(f"{BUCKET_NAME}/{VECTORS_OUTPUT}/ingest_date=*/*.parquet")
+    if not files:
+        print("  ✓ No existing vectors in gold layer")
+        return None
+    
+    dataset = ds.dataset(files, format="parquet", filesystem=fs, schema=GOLD_VECTOR_SCHEMA)
+    table = dataset.to_table(use_threads=True)
+    print(f"  ✓ Found {table.num_rows} existing vectors in gold layer")
+    return table
+
+
+def match_existing_vectors(
+    order_ids: pa.ChunkedArray,
+    text_hashes: pa.Array,
+    existing: Optional[pa.Table],
+) -> np.ndarray:
+    """
+    Anti-join current orders against the gold layer.
+    
+    Returns, for each current order, the row index of its unchanged vector in
+    `existing`, or -1 if the order is new or its text has changed.
+    """
+    if existing is None or existing.num_rows == 0:
+        return np.full(len(text_hashes), -1, dtype=np.int64)
+    
+    current = pa.table({
+        'order_id': pc.cast(order_ids, pa.string()),
+        'text_hash': text_hashes,
+        'row': pa.array(np.arange(len(text_hashes), dtype=np.int64)),
+    })
+    known = pa.table({
+        'order_id': existing['order_id'],
+        'text_hash': existing['text_hash'],
+        'existing_row': pa.array(np.arange(existing.num_rows, dtype=np.int64)),
+    }).group_by(['order_id', 'text_hash']).aggregate([('existing_row', 'min')])
+    
+    joined = current.join(known, keys=['order_id', 'text_hash'], join_type='left outer')
+    joined = joined.sort_by('row')
+    return pc.fill_null(joined['existing_row_min'], -1).to_numpy()
+
+
+def encode_texts(model, texts: List[str]) -> np.ndarray:
+    """Encode texts into an (n_texts, EMBEDDING_DIM) float32 array."""
+    # Let sentence-transformers batch internally; the result is a single
+    # contiguous array
+    return model.encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True,
+    ).astype(np.float32, copy=False)
+
+
+def generate_embeddings(
+    orders: pa.Table,
+    existing: Optional[pa.Table],
+) -> Tuple[np.ndarray, pa.Array, np.ndarray]:
+    """
+    Generate embeddings for all orders, reusing unchanged vectors.
+    
+    Returns the (n_orders, EMBEDDING_DIM) embedding array, the text hashes,
+    and a boolean mask of the rows that were newly encoded.
+    """
     print("\nGenerating embeddings...")
     
     # Create text representations
-    texts = df.apply(create_text_for_embedding, axis=1).tolist()
+    texts = create_texts_for_embedding(orders)
+    text_hashes = hash_texts(texts)
     
-    # Generate embeddings in batches
-    batch_size = 32
-    all_embeddings = []
+    existing_rows = match_existing_vectors(orders['OrderId'], text_hashes, existing)
+    new_mask = existing_rows < 0
+    reused = ~new_mask
     
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        embeddings = model.encode(batch, show_progress_bar=False)
-        all_embeddings.extend(embeddings)
-        
-        if (i + batch_size) % 100 == 0 or i + batch_size >= len(texts):
-            print(f"  ✓ Processed {min(i + batch_size, len(texts))}/{len(texts)} orders")
-    
-    # Create output DataFrame
-    df_vectors = pd.DataFrame({
-        'order_id': df['OrderId'],
-        'embedding': [emb.tolist() for emb in all_embeddings],
-        'text': texts,  # Keep text for reference
-    })
+    embeddings = np.empty((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    if reused.any():
+        existing_vectors = (
+            existing['vector'].combine_chunks().flatten()
+            .to_numpy().reshape(-1, EMBEDDING_DIM)
+        )
+        embeddings[reused] = existing_vectors[existing_rows[reused]]
+    print(f"  ✓ Reused {int(reused.sum())} unchanged embeddings")
+    
+    if new_mask.any():
+        # Only pay for model loading when there is something to encode
+        model = load_embedding_model()
+        new_texts = [text for text, is_new in zip(texts, new_mask) if is_new]
+        embeddings[new_mask] = encode_texts(model, new_texts)
     
-    print(f"  ✓ Generated {len(df_vectors)} embeddings")
-    return df_vectors
+    print(f"  ✓ Generated {int(new_mask.sum())} new embeddings")
+    return embeddings, text_hashes, new_mask
 
 
-def write_vectors_to_minio(s3_client, df_vectors: pd.DataFrame):
-    """Write vector data to MinIO for Iceberg and Milvus."""
-    print("\nWriting vectors to MinIO...")
+def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize normalized embeddings to int8 with a per-vector scale.
+    
+    Each vector is scaled so its largest component maps to 127; the original
+    values are recovered as `q / scale`.
+    """
+    max_abs = np.max(np.abs(embeddings), axis=1, keepdims=True)
+    scale = 127.0 / np.maximum(max_abs, np.finfo(np.float32).tiny)
+    q = np.clip(np.round(embeddings * scale), -128, 127).astype(np.int8)
+    return q, scale.reshape(-1).astype(np.float32)
+
+
+def build_vectors_table(order_ids: pa.ChunkedArray, embeddings: np.ndarray) -> pa.Table:
+    """
+    Build the Arrow table of int8-quantized vectors for Milvus bulk import.
+    
+    Milvus expects: id (INT64), vector (FLOAT_VECTOR). Vectors are stored as
+    fixed_size_list<int8> plus a float32 scale (4x smaller than float32);
+    milvus_bulk_load.py dequantizes them on load. The full-precision vectors
+    stay in the gold layer.
+    """
+    q, scale = quantize_int8(embeddings)
+    vectors = pa.FixedSizeListArray.from_arrays(pa.array(q.reshape(-1)), EMBEDDING_DIM)
     
-    # Prepare data for Milvus (needs flat vector format)
-    # Milvus expects: id (INT64), vector (FLOAT_VECTOR)
-    df_milvus = pd.DataFrame({
-        'id': range(len(df_vectors)),  # Milvus needs integer IDs
-        'order_id': df_vectors['order_id'],
-        'vector': df_vectors['embedding'],
+    return pa.table({
+        'id': pa.array(np.arange(len(embeddings), dtype=np.int64)),  # Milvus needs integer IDs
+        'order_id': pc.cast(order_ids, pa.string()),
+        'vector_int8': vectors,
+        'vector_scale': pa.array(scale),
     })
+
+
+def write_new_vectors_to_gold(
+    fs: s3fs.S3FileSystem,
+    order_ids: pa.ChunkedArray,
+    text_hashes: pa.Array,
+    embeddings: np.ndarray,
+    new_mask: np.ndarray,
+):
+    """Append newly encoded vectors to the gold layer, partitioned by ingest date."""
+    if not new_mask.any():
+        print("  ✓ Gold layer already up to date")
+        return
     
-    # Write to Parquet for Milvus bulk import
-    buffer = io.BytesIO()
+    mask = pa.array(new_mask)
+    new_embeddings = embeddings[new_mask]
+    vectors = pa.FixedSizeListArray.from_arrays(pa.array(new_embeddings.reshape(-1)), EMBEDDING_DIM)
+    ingest_date = datetime.now().strftime('%Y-%m-%d')
+    
+    table = pa.table({
+        'order_id': pc.cast(order_ids, pa.string()).filter(mask),
+        'text_hash': text_hashes.filter(mask),
+        'vector': vectors,
+        'ingest_date': pa.array([ingest_date] * len(new_embeddings)),
+    })
     
-    # Convert embedding list to proper format for Parquet
-    # Milvus bulk import expects a specific format
-    df_export = df_milvus.copy()
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    pq.write_to_dataset(
+        table,
+        root_path=f"{BUCKET_NAME}/{VECTORS_OUTPUT}",
+        partition_cols=['ingest_date'],
+        filesystem=fs,
+        basename_template=f"vectors_{run_id}_{{i}}.parquet",
+        compression='zstd',
+    )
+    print(f"  ✓ Appended {table.num_rows} vectors to "
+          f"s3://{BUCKET_NAME}/{VECTORS_OUTPUT}/ingest_date={ingest_date}/")
+
+
+def write_vectors_to_minio(s3_client, order_ids: pa.ChunkedArray, embeddings: np.ndarray):
+    """Write the full vector snapshot to MinIO for Milvus bulk import."""
+    table = build_vectors_table(order_ids, embeddings)
     
-    table = pa.Table.from_pandas(df_export)
-    pq.write_table(table, buffer)
+    buffer = io.BytesIO()
+    pq.write_table(table, buffer, compression='zstd', use_dictionary=['order_id'])
     buffer.seek(0)
     
+    # Multipart upload for large files
     milvus_key = f"{MILVUS_IMPORT}/vectors.parquet"
-    s3_client.put_object(
-        Bucket=BUCKET_NAME,
-        Key=milvus_key,
-        Body=buffer.getvalue()
-    )
+    s3_client.upload_fileobj(buffer, BUCKET_NAME, milvus_key)
     print(f"  ✓ Wrote s3://{BUCKET_NAME}/{milvus_key}")
     
-    # Also write to gold/vectors for Iceberg consumption
-    buffer2 = io.BytesIO()
-    pq.write_table(table, buffer2)
-    buffer2.seek(0)
-    
-    gold_key = f"{VECTORS_OUTPUT}/vectors.parquet"
-    s3_client.put_object(
-        Bucket=BUCKET_NAME,
-        Key=gold_key,
-        Body=buffer2.getvalue()
-    )
-    print(f"  ✓ Wrote s3://{BUCKET_NAME}/{gold_key}")
-    
     return milvus_key
 
 
@@ -207,21 +478,25 @@ def main():
     
     # Initialize clients
     s3_client = create_s3_client()
-    model = load_embedding_model()
+    fs = create_s3_filesystem()
     
-    # Read orders
-    df_orders = read_orders_from_landing(s3_client)
+    # Read orders and the vectors already in the gold layer
+    orders = read_orders_from_landing(fs)
+    existing = read_existing_vectors(fs)
     
-    # Generate embeddings
-    df_vectors = generate_embeddings(model, df_orders)
+    # Generate embeddings (only for new or changed orders)
+    embeddings, text_hashes, new_mask = generate_embeddings(orders, existing)
     
     # Write to MinIO
-    milvus_path = write_vectors_to_minio(s3_client, df_vectors)
+    print("\nWriting vectors to MinIO...")
+    write_new_vectors_to_gold(fs, orders['OrderId'], text_hashes, embeddings, new_mask)
+    milvus_path = write_vectors_to_minio(s3_client, orders['OrderId'], embeddings)
     
     print("\n" + "=" * 60)
     print("✓ Embedding generation complete!")
     print("=" * 60)
-    print(f"\nOrders processed: {len(df_vectors)}")
+    print(f"\nOrders processed: {len(embeddings)}")
+    print(f"New/changed orders encoded: {int(new_mask.sum())}")
     print(f"Embedding dimension: {EMBEDDING_DIM}")
     print(f"Model: {MODEL_NAME}")
     print(f"\nMilvus import file: s3://{BUCKET_NAME}/{milvus_path}")
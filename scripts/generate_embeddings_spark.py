@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Spark Job: Generate Order Embeddings with a pandas UDF.
+
+Distributed alternative to generate_embeddings.py. Instead of reading every
+landing-zone file into a single driver process, this job builds the embedding
+text from the Iceberg orders table and encodes it partition-wise on the
+executors. Rows are shipped to Python as Arrow batches, and the
+sentence-transformer model is loaded once per executor Python worker.
+
+The vectors are merged into an Iceberg table in the gold namespace:
+  nessie.gold.order_embeddings (order_id, text_hash, text, vector)
+
+Each order's text is hashed, and only orders whose (order_id, text_hash) pair
+is not already in the table are encoded and MERGEd.
+
+Prerequisites (inside the Spark container):
+  pip install sentence-transformers pyarrow pandas
+
+Run this inside the Spark container (see bridge_ravendb.py for full command),
+or use the helper script:
+  ./run_spark.sh generate_embeddings_spark.py
+"""
+
+import os
+
+import pandas as pd
+from pyspark.sql import SparkSession
+from pyspark.sql.functions import coalesce, col, concat, format_string, lit, pandas_udf, xxhash64
+from pyspark.sql.types import ArrayType, FloatType
+
+# Embedding model config (must match generate_embeddings.py)
+MODEL_NAME = "all-MiniLM-L6-v2"  # 384 dimensions, fast
+EMBEDDING_DIM = 384
+EMBEDDING_BATCH_SIZE = 256
+
+EMBEDDINGS_TABLE = "nessie.gold.order_embeddings"
+# Must match the bucket(N, order_id) transform in the table DDL
+ORDER_BUCKETS = 16
+# Local copy of the model on the shared data volume (see generate_embeddings.py)
+MODEL_PATH = os.getenv('EMBEDDING_MODEL_PATH', f'/opt/spark/data/models/{MODEL_NAME}')
+
+# Cached per executor Python worker so the model is loaded only once
+_model = None
+
+
+def create_spark_session():
+    """Create Spark session with Iceberg and Nessie configuration."""
+    return SparkSession.builder \
+        .appName("Order_Embeddings") \
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true") \
+        .config("spark.sql.execution.arrow.maxRecordsPerBatch", str(EMBEDDING_BATCH_SIZE * 2)) \
+        .config("spark.sql.sources.v2.bucketing.enabled", "true") \
+        .config("spark.sql.iceberg.planning.preserve-data-grouping", "true") \
+        .config("spark.sql.join.preferSortMergeJoin", "false") \
+        .getOrCreate()
+
+
+def get_model():
+    """Load the sentence-transformer model once per executor process."""
+    global _model
+    if _model is None:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(MODEL_PATH if os.path.isdir(MODEL_PATH) else MODEL_NAME)
+    return _model
+
+
+@pandas_udf(ArrayType(FloatType()))
+def embed(texts: pd.Series) -> pd.Series:
+    """Encode a batch of order texts into normalized embedding vectors."""
+    vectors = get_model().encode(
+        texts.tolist(),
+        batch_size=EMBEDDING_BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return pd.Series(list(vectors))
+
+
+def create_namespace_if_not_exists(spark):
+    """Create the gold namespace if it doesn't exist."""
+    spark.sql("CREATE NAMESPACE IF NOT EXISTS nessie.gold")
+    print("✓ Namespace 'nessie.gold' ready")
+
+
+def create_embeddings_table(spark):
+    """Create the Iceberg embeddings table if it doesn't exist."""
+    # Bucketing on the MERGE key lets both sides of the MERGE be co-partitioned
+    spark.sql(f"""
+        CREATE TABLE IF NOT EXISTS {EMBEDDINGS_TABLE} (
+            order_id STRING,
+            text_hash BIGINT,
+            text STRING,
+            vector ARRAY<FLOAT>
+        ) USING iceberg
+        PARTITIONED BY (bucket({ORDER_BUCKETS}, order_id))
+    """)
+    
+    # Merge-on-read: MERGE writes small delete files instead of rewriting
+    # every data file touched by a matched row
+    spark.sql(f"""
+        ALTER TABLE {EMBEDDINGS_TABLE} SET TBLPROPERTIES (
+            'format-version' = '2',
+            'write.merge.mode' = 'merge-on-read',
+            'write.update.mode' = 'merge-on-read',
+            'write.delete.mode' = 'merge-on-read'
+        )
+    """)
+    print(f"✓ Table '{EMBEDDINGS_TABLE}' ready")
+
+
+def read_order_texts(spark):
+    """Build the embedding text for each order (same format as generate_embeddings.py)."""
+    def text(name):
+        return coalesce(col(name).cast("string"), lit("unknown"))
+
+    return spark.table("nessie.structured_data.orders").select(
+        col("OrderId").alias("order_id"),
+        concat(
+            lit("Order "), text("OrderId"),
+            lit(". Customer: "), text("CustomerId"),
+            lit(". Status: "), text("Status"),
+            lit(". Amount: $"), format_string("%.2f", coalesce(col("TotalAmount"), lit(0.0))),
+            lit(". Ship to: "), text("ShipCity"), lit(", "), text("ShipCountry"),
+            lit(". Items: "), coalesce(col("LineCount"), lit(0)).cast("string"), lit(" line items"),
+        ).alias("text"),
+    ).withColumn("text_hash", xxhash64(col("text")))
+
+
+def filter_changed_texts(spark, df_texts):
+    """Keep only orders whose (order_id, text_hash) is not already embedded."""
+    existing = spark.table(EMBEDDINGS_TABLE).select("order_id", "text_hash")
+    return df_texts.join(existing, ["order_id", "text_hash"], "left_anti")
+
+
+def merge_embeddings(spark, df_new):
+    """MERGE new and changed embeddings into the gold Iceberg table."""
+    df_new.select("order_id", "text_hash", "text", "vector") \
+        .repartition(ORDER_BUCKETS, col("order_id")) \
+        .createOrReplaceTempView("embeddings_source")
+    
+    spark.sql(f"""
+        MERGE INTO {EMBEDDINGS_TABLE} AS target
+        USING embeddings_source AS source
+        ON target.order_id = source.order_id
+        WHEN MATCHED AND target.text_hash <> source.text_hash THEN
+            UPDATE SET text_hash = source.text_hash, text = source.text, vector = source.vector
+        WHEN NOT MATCHED THEN INSERT *
+    """)
+    print(f"✓ Merged embeddings into '{EMBEDDINGS_TABLE}'")
+
+
+def main():
+    print("=" * 60)
+    print("Order Embeddings - Spark pandas UDF")
+    print("=" * 60)
+
+    # Create Spark session
+    print("\nInitializing Spark session...")
+    spark = create_spark_session()
+
+    create_namespace_if_not_exists(spark)
+    create_embeddings_table(spark)
+
+    # Build texts and encode only new or changed orders on the executors
+    print("\nGenerating embeddings...")
+    df_new = filter_changed_texts(spark, read_order_texts(spark))
+    if not df_new.take(1):
+        print("✓ Embeddings already up to date")
+    else:
+        merge_embeddings(spark, df_new.withColumn("vector", embed(col("text"))))
+
+    count = spark.sql(f"SELECT COUNT(*) AS cnt FROM {EMBEDDINGS_TABLE}").collect()[0]["cnt"]
+
+    print("\n" + "=" * 60)
+    print("✓ Embedding generation complete!")
+    print("=" * 60)
+    print(f"\nOrders embedded: {count}")
+    print(f"Embedding dimension: {EMBEDDING_DIM}")
+    print(f"Model: {MODEL_NAME}")
+
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -21,17 +21,21 @@ Requirements:
 
 import argparse
 import os
+import re
 import sys
-import json
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import h5py
+import numpy as np
 import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from dotenv import load_dotenv
 
@@ -46,24 +50,85 @@ BUCKET_NAME = "lakehouse"
 
 # HDF5 file extensions to recognize
 HDF5_EXTENSIONS = {'.h5', '.hdf5', '.nxs', '.nx5', '.nxs.h5'}
+_HDF5_RE = re.compile(r'\.(?:h5|hdf5|nxs|nx5|nxs\.h5)$', re.IGNORECASE)
 
+# Common NXentry group names, probed before scanning the root group
+NXENTRY_PROBES = ('entry', 'entry0', 'entry1')
 
+# HDF5 raw-data chunk cache per open file (default is 1 MiB / 521 slots)
+RDCC_NBYTES = 64 * 1024 * 1024
+RDCC_NSLOTS = 100003  # prime, well above the number of cached chunks
+# Page buffer for files written with paged aggregation
+PAGE_BUF_SIZE = 16 * 1024 * 1024
+
+# Concurrent S3 uploads (I/O bound, botocore releases the GIL)
+UPLOAD_WORKERS = 8
+
+# Multipart settings for large HDF5 uploads (small parts throttle MinIO)
+HDF5_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=64 * 1024 * 1024,
+    multipart_chunksize=32 * 1024 * 1024,
+    max_concurrency=10,
+    use_threads=True,
+)
+
+# AWS CRT transfer settings, used when awscrt is installed
+CRT_PART_SIZE = 32 * 1024 * 1024
+CRT_TARGET_THROUGHPUT = 10 * 1000 ** 3 // 8  # 10 Gbps, in bytes per second
+
+# Files per RecordBatch written to the metadata Parquet file
+WRITE_BATCH_SIZE = 256
+# Upper bound on rows per Parquet row group
+ROW_GROUP_SIZE = 64 * 1024
+
+# Columns kept in memory for the ingestion summary and Tiled catalog
+SUMMARY_COLUMNS = [
+    'file_name', 'file_size_bytes', 'tiled_uri', 'title',
+    'instrument_name', 'sample_name', 'start_time',
+]
+
+
+@lru_cache(maxsize=1)
 def create_s3_client():
-    """Create a boto3 S3 client configured for MinIO."""
+    """
+    Create a boto3 S3 client configured for MinIO.
+    
+    Cached per process so every upload reuses the same connection pool.
+    """
     return boto3.client(
         "s3",
         endpoint_url=MINIO_ENDPOINT,
         aws_access_key_id=MINIO_ACCESS_KEY,
         aws_secret_access_key=MINIO_SECRET_KEY,
-        config=Config(signature_version="s3v4"),
+        config=Config(
+            signature_version="s3v4",
+            max_pool_connections=32,
+            retries={'max_attempts': 10, 'mode': 'adaptive'},
+            tcp_keepalive=True,
+        ),
         region_name="us-east-1",
     )
 
 
 def is_hdf5_file(path: Path) -> bool:
     """Check if a file is an HDF5 file based on extension."""
-    suffixes = ''.join(path.suffixes).lower()
-    return any(suffixes.endswith(ext) for ext in HDF5_EXTENSIONS)
+    return bool(_HDF5_RE.search(path.name))
+
+
+def open_hdf5(file_path: Path) -> h5py.File:
+    """
+    Open an HDF5 file read-only with a large chunk cache.
+    
+    Files written with the paged file-space strategy are reopened with a
+    page buffer so metadata reads are served in whole pages.
+    """
+    f = h5py.File(file_path, 'r', rdcc_nbytes=RDCC_NBYTES, rdcc_nslots=RDCC_NSLOTS)
+    strategy = f.id.get_create_plist().get_file_space_strategy()[0]
+    if strategy != h5py.h5f.FSPACE_STRATEGY_PAGE:
+        return f
+    f.close()
+    return h5py.File(file_path, 'r', rdcc_nbytes=RDCC_NBYTES, rdcc_nslots=RDCC_NSLOTS,
+                     page_buf_size=PAGE_BUF_SIZE)
 
 
 def extract_nexus_metadata(h5file: h5py.File) -> Dict[str, Any]:
@@ -77,7 +142,6 @@ def extract_nexus_metadata(h5file: h5py.File) -> Dict[str, Any]:
     
     def safe_decode(value):
         """Safely decode bytes to string, flattening arrays."""
-        import numpy as np
         if value is None:
             return None
         if isinstance(value, bytes):
@@ -86,9 +150,16 @@ def extract_nexus_metadata(h5file: h5py.File) -> Dict[str, Any]:
             # Flatten numpy arrays to a single string
             if value.size == 0:
                 return ''
-            flat = value.flatten()
-            if flat.dtype.kind in ('S', 'U', 'O'):  # String types
-                decoded = [safe_decode(v) for v in flat]
+            flat = value.ravel()
+            kind = flat.dtype.kind
+            if kind in ('S', 'U', 'O'):  # String types
+                if kind == 'S':
+                    decoded = np.char.decode(flat, 'utf-8', errors='replace').tolist()
+                elif kind == 'U':
+                    decoded = flat.tolist()
+                else:
+                    decoded = [v.decode('utf-8', errors='replace') if isinstance(v, bytes) else v
+                               for v in flat]
                 return ', '.join(str(d) for d in decoded if d)
             else:
                 return str(flat[0]) if flat.size == 1 else str(flat.tolist())
@@ -113,80 +184,98 @@ def extract_nexus_metadata(h5file: h5py.File) -> Dict[str, Any]:
             if name in group:
                 ds = group[name]
                 if isinstance(ds, h5py.Dataset):
-                    val = ds[()]
+                    if ds.chunks is not None and ds.size > 1 and ds.dtype.kind != 'O':
+                        # Read chunked arrays straight into a preallocated buffer
+                        val = np.empty(ds.shape, dtype=ds.dtype)
+                        ds.read_direct(val)
+                    else:
+                        val = ds[()]
                     return safe_decode(val)
             return default
         except Exception:
             return default
     
-    # Find NXentry groups (main data entries)
-    for entry_name in h5file.keys():
-        entry = h5file[entry_name]
-        if not isinstance(entry, h5py.Group):
-            continue
-            
-        nx_class = get_attr(entry, 'NX_class')
-        if nx_class == 'NXentry' or entry_name.startswith('entry'):
-            # Entry-level metadata
-            metadata['entry_name'] = entry_name
-            metadata['title'] = get_dataset_value(entry, 'title', '')
-            metadata['experiment_identifier'] = get_dataset_value(entry, 'experiment_identifier', '')
-            metadata['start_time'] = get_dataset_value(entry, 'start_time', '')
-            metadata['end_time'] = get_dataset_value(entry, 'end_time', '')
-            metadata['duration'] = get_dataset_value(entry, 'duration', 0)
-            metadata['run_number'] = get_dataset_value(entry, 'run_number', '')
-            
-            # Instrument metadata
-            if 'instrument' in entry or any('instrument' in k.lower() for k in entry.keys()):
-                inst_key = next((k for k in entry.keys() if 'instrument' in k.lower()), 'instrument')
-                if inst_key in entry:
-                    inst = entry[inst_key]
-                    metadata['instrument_name'] = get_dataset_value(inst, 'name', '')
-                    metadata['instrument_type'] = get_attr(inst, 'NX_class', '')
-                    
-                    # Look for specific instrument components
-                    for comp_name in inst.keys():
-                        comp = inst[comp_name]
-                        if isinstance(comp, h5py.Group):
-                            comp_class = get_attr(comp, 'NX_class', '')
-                            if comp_class == 'NXsource':
-                                metadata['source_name'] = get_dataset_value(comp, 'name', '')
-                                metadata['source_type'] = get_dataset_value(comp, 'type', '')
-            
-            # Sample metadata
-            if 'sample' in entry:
-                sample = entry['sample']
-                metadata['sample_name'] = get_dataset_value(sample, 'name', '')
-                metadata['sample_description'] = get_dataset_value(sample, 'description', '')
-            
-            # User metadata
-            if 'user' in entry:
-                user = entry['user']
-                metadata['user_name'] = get_dataset_value(user, 'name', '')
-                metadata['user_facility'] = get_dataset_value(user, 'facility_user_id', '')
-            
-            break  # Only process first entry
+    def find_entry():
+        """Return (name, group) of the first NXentry, probing common names first."""
+        for name in NXENTRY_PROBES:
+            entry = h5file.get(name)
+            if isinstance(entry, h5py.Group):
+                return name, entry
+        for name in h5file.keys():
+            entry = h5file[name]
+            if isinstance(entry, h5py.Group) and \
+                    (name.startswith('entry') or get_attr(entry, 'NX_class') == 'NXentry'):
+                return name, entry
+        return None, None
+    
+    # Find the main NXentry group (only the first entry is processed)
+    entry_name, entry = find_entry()
+    if entry is None:
+        return metadata
+    
+    # Entry-level metadata
+    metadata['entry_name'] = entry_name
+    metadata['title'] = get_dataset_value(entry, 'title', '')
+    metadata['experiment_identifier'] = get_dataset_value(entry, 'experiment_identifier', '')
+    metadata['start_time'] = get_dataset_value(entry, 'start_time', '')
+    metadata['end_time'] = get_dataset_value(entry, 'end_time', '')
+    metadata['duration'] = get_dataset_value(entry, 'duration', 0)
+    metadata['run_number'] = get_dataset_value(entry, 'run_number', '')
+    
+    # Instrument metadata (single pass over the entry's keys)
+    inst_key = next((k for k in entry.keys() if 'instrument' in k.lower()), None)
+    if inst_key is not None:
+        inst = entry[inst_key]
+        metadata['instrument_name'] = get_dataset_value(inst, 'name', '')
+        metadata['instrument_type'] = get_attr(inst, 'NX_class', '')
+        
+        # Look for specific instrument components
+        for comp_name in inst.keys():
+            comp = inst[comp_name]
+            if isinstance(comp, h5py.Group):
+                comp_class = get_attr(comp, 'NX_class', '')
+                if comp_class == 'NXsource':
+                    metadata['source_name'] = get_dataset_value(comp, 'name', '')
+                    metadata['source_type'] = get_dataset_value(comp, 'type', '')
+    
+    # Sample metadata
+    if 'sample' in entry:
+        sample = entry['sample']
+        metadata['sample_name'] = get_dataset_value(sample, 'name', '')
+        metadata['sample_description'] = get_dataset_value(sample, 'description', '')
+    
+    # User metadata
+    if 'user' in entry:
+        user = entry['user']
+        metadata['user_name'] = get_dataset_value(user, 'name', '')
+        metadata['user_facility'] = get_dataset_value(user, 'facility_user_id', '')
     
     return metadata
 
 
-def extract_hdf5_metadata(file_path: Path) -> Dict[str, Any]:
+def extract_hdf5_metadata(file_path: Path, st: Optional[os.stat_result] = None) -> Dict[str, Any]:
     """
     Extract comprehensive metadata from an HDF5 file.
     
+    `st` is the file's stat result if the caller already has it (avoids
+    another round-trip on networked filesystems).
+    
     Returns a dictionary containing:
     - File information (path, size, timestamps)
     - HDF5 structure information (groups, datasets)
     - NeXus-specific metadata if applicable
     - Data array shapes and types
     """
+    if st is None:
+        st = file_path.stat()
+    
     metadata = {
         # File information
         'file_path': str(file_path.absolute()),
         'file_name': file_path.name,
-        'file_size_bytes': file_path.stat().st_size,
-        'file_modified_time': datetime.fromtimestamp(file_path.stat().st_mtime).isoformat(),
-        'file_created_time': datetime.fromtimestamp(file_path.stat().st_ctime).isoformat(),
+        'file_size_bytes': st.st_size,
+        'file_modified_time': datetime.fromtimestamp(st.st_mtime).isoformat(),
+        'file_created_time': datetime.fromtimestamp(st.st_ctime).isoformat(),
         'ingestion_time': datetime.now().isoformat(),
         
         # Tiled serving information
@@ -196,37 +285,44 @@ def extract_hdf5_metadata(file_path: Path) -> Dict[str, Any]:
     }
     
     try:
-        with h5py.File(file_path, 'r') as f:
+        with open_hdf5(file_path) as f:
             # Basic HDF5 structure info
             metadata['hdf5_driver'] = f.driver
             metadata['hdf5_libver'] = str(f.libver)
             
-            # Count groups and datasets
+            # Count groups and datasets with a low-level visit: the callback
+            # only sees object types, no h5py Group/Dataset is built per node
             group_count = 0
-            dataset_count = 0
-            dataset_info = []
+            dataset_names = []
+            
+            def visitor(name, info):
+                nonlocal group_count
+                if info.type == h5py.h5o.TYPE_GROUP:
+                    if name != b'.':  # visititems does not count the root group
+                        group_count += 1
+                elif info.type == h5py.h5o.TYPE_DATASET:
+                    dataset_names.append(name)
             
-            def visitor(name, obj):
-                nonlocal group_count, dataset_count
-                if isinstance(obj, h5py.Group):
-                    group_count += 1
-                elif isinstance(obj, h5py.Dataset):
-                    dataset_count += 1
-                    # Collect info about significant datasets
-                    if obj.size > 100:  # Only track non-trivial datasets
-                        ds_info = {
-                            'path': name,
-                            'shape': list(obj.shape),
-                            'dtype': str(obj.dtype),
-                            'size': obj.size,
-                        }
-                        dataset_info.append(ds_info)
+            h5py.h5o.visit(f.id, visitor, info=True)
+            dataset_count = len(dataset_names)
             
-            f.visititems(visitor)
+            # Collect info about significant datasets, stopping at the top 20
+            dataset_info = []
+            for name in dataset_names:
+                obj = f[name]
+                if obj.size > 100:  # Only track non-trivial datasets
+                    dataset_info.append({
+                        'path': name.decode('utf-8', errors='replace'),
+                        'shape': list(obj.shape),
+                        'dtype': str(obj.dtype),
+                        'size': obj.size,
+                    })
+                    if len(dataset_info) == 20:
+                        break
             
             metadata['group_count'] = group_count
             metadata['dataset_count'] = dataset_count
-            metadata['significant_datasets'] = json.dumps(dataset_info[:20])  # Limit to top 20
+            metadata['significant_datasets'] = dataset_info
             
             # Extract NeXus-specific metadata
             nexus_metadata = extract_nexus_metadata(f)
@@ -255,7 +351,12 @@ def create_parquet_schema() -> pa.Schema:
         ('hdf5_libver', pa.string()),
         ('group_count', pa.int32()),
         ('dataset_count', pa.int32()),
-        ('significant_datasets', pa.string()),  # JSON array
+        ('significant_datasets', pa.list_(pa.struct([
+            ('path', pa.string()),
+            ('shape', pa.list_(pa.int64())),
+            ('dtype', pa.string()),
+            ('size', pa.int64()),
+        ]))),
         ('entry_name', pa.string()),
         ('title', pa.string()),
         ('experiment_identifier', pa.string()),
@@ -272,41 +373,79 @@ def create_parquet_schema() -> pa.Schema:
         ('user_name', pa.string()),
         ('user_facility', pa.string()),
         ('extraction_error', pa.string()),
+        ('s3_uri', pa.string()),
     ])
 
 
-def metadata_to_dataframe(metadata_list: List[Dict[str, Any]]) -> pd.DataFrame:
-    """Convert list of metadata dictionaries to a DataFrame."""
-    # Ensure all expected columns exist
-    schema_fields = [
-        'file_path', 'file_name', 'file_size_bytes', 'file_modified_time',
-        'file_created_time', 'ingestion_time', 'tiled_uri', 'tiled_adapter',
-        'content_type', 'hdf5_driver', 'hdf5_libver', 'group_count',
-        'dataset_count', 'significant_datasets', 'entry_name', 'title',
-        'experiment_identifier', 'start_time', 'end_time', 'duration',
-        'run_number', 'instrument_name', 'instrument_type', 'source_name',
-        'source_type', 'sample_name', 'sample_description', 'user_name',
-        'user_facility', 'extraction_error'
+# Built once at import; every batch is converted against this explicit schema
+SCHEMA = create_parquet_schema()
+
+
+def coerce_value(value: Any, type_: pa.DataType) -> Any:
+    """Coerce an extracted value to its column type (None if it doesn't fit)."""
+    if value is None or pa.types.is_nested(type_):
+        return value
+    try:
+        if pa.types.is_integer(type_):
+            return int(value)
+        if pa.types.is_floating(type_):
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+def metadata_to_record_batch(metadata_list: List[Dict[str, Any]],
+                             schema: pa.Schema = SCHEMA) -> pa.RecordBatch:
+    """Build a RecordBatch column by column from metadata dicts (missing fields are null)."""
+    arrays = [
+        pa.array([coerce_value(record.get(field.name), field.type) for record in metadata_list],
+                 type=field.type)
+        for field in schema
     ]
-    
-    for record in metadata_list:
-        for field in schema_fields:
-            if field not in record:
-                record[field] = None
-    
-    return pd.DataFrame(metadata_list)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
 
 
-def save_parquet_local(df: pd.DataFrame, output_path: Path) -> Path:
-    """Save DataFrame to local Parquet file."""
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    pq.write_table(
-        pa.Table.from_pandas(df),
-        output_path,
-        compression='snappy'
+def metadata_to_dataframe(batch: pa.RecordBatch) -> pd.DataFrame:
+    """Convert the summary columns of a metadata batch to a DataFrame."""
+    return batch.select(SUMMARY_COLUMNS).to_pandas()
+
+
+@lru_cache(maxsize=1)
+def create_crt_transfer_manager():
+    """
+    Create an AWS CRT transfer manager for bronze HDF5 uploads.
+    
+    The CRT client uploads parts in parallel from native threads. Returns
+    None if awscrt is not installed (pip install "boto3[crt]"), in which
+    case uploads fall back to boto3's Python transfer manager.
+    """
+    try:
+        import botocore.session
+        from s3transfer.crt import (
+            BotocoreCRTCredentialsWrapper, BotocoreCRTRequestSerializer,
+            CRTTransferManager, create_s3_crt_client,
+        )
+    except ImportError:
+        return None
+    
+    session = botocore.session.Session()
+    session.set_credentials(MINIO_ACCESS_KEY, MINIO_SECRET_KEY)
+    credentials = BotocoreCRTCredentialsWrapper(session.get_credentials())
+    
+    crt_client = create_s3_crt_client(
+        "us-east-1",
+        crt_credentials_provider=credentials.to_crt_credentials_provider(),
+        target_throughput=CRT_TARGET_THROUGHPUT,
+        part_size=CRT_PART_SIZE,
+        use_ssl=MINIO_ENDPOINT.startswith("https"),
     )
-    print(f"✓ Saved metadata to {output_path}")
-    return output_path
+    serializer = BotocoreCRTRequestSerializer(session, client_kwargs={
+        "region_name": "us-east-1",
+        "endpoint_url": MINIO_ENDPOINT,
+        "config": Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+    })
+    return CRTTransferManager(crt_client, serializer)
 
 
 def upload_to_s3(local_path: Path, s3_key: str) -> str:
@@ -324,80 +463,146 @@ def upload_to_s3(local_path: Path, s3_key: str) -> str:
     return s3_uri
 
 
-def upload_hdf5_to_bronze(file_path: Path) -> str:
+def upload_hdf5_to_bronze(file_path: Path, client=None) -> str:
     """
     Upload the original HDF5 file to the bronze layer for serving.
     
     Returns the S3 URI of the uploaded file.
     """
-    client = create_s3_client()
+    client = client or create_s3_client()
     
     # Preserve directory structure under bronze/hdf5/
     s3_key = f"bronze/hdf5/{file_path.name}"
     
-    client.upload_file(
-        str(file_path),
-        BUCKET_NAME,
-        s3_key
-    )
+    crt_manager = create_crt_transfer_manager()
+    if crt_manager is not None:
+        crt_manager.upload(str(file_path), BUCKET_NAME, s3_key).result()
+    else:
+        client.upload_file(
+            str(file_path),
+            BUCKET_NAME,
+            s3_key,
+            Config=HDF5_TRANSFER_CONFIG
+        )
     
     s3_uri = f"s3://{BUCKET_NAME}/{s3_key}"
     print(f"✓ Uploaded HDF5 file to {s3_uri}")
     return s3_uri
 
 
-def process_files(paths: List[str], upload_hdf5: bool = False) -> pd.DataFrame:
+def scan_hdf5_files(directory: Path) -> Iterator[Tuple[Path, os.stat_result]]:
     """
-    Process one or more HDF5 files or directories.
+    Recursively yield (path, stat) for HDF5 files under a directory.
     
-    Args:
-        paths: List of file paths or directory paths
-        upload_hdf5: Whether to upload original HDF5 files to S3
-        
-    Returns:
-        DataFrame with all extracted metadata
+    Uses os.scandir so file/directory checks come from the directory entry
+    and each file is stat'ed only once.
     """
-    all_metadata = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_hdf5_files(Path(entry.path))
+            elif _HDF5_RE.search(entry.name) and entry.is_file():
+                yield Path(entry.path), entry.stat()
+
+
+def collect_hdf5_files(paths: List[str]) -> List[Tuple[Path, os.stat_result]]:
+    """Expand file and directory arguments into (path, stat) pairs of HDF5 files."""
+    files = []
     
     for path_str in paths:
         path = Path(path_str).expanduser()
         
         if path.is_file():
             if is_hdf5_file(path):
-                print(f"Processing: {path}")
-                metadata = extract_hdf5_metadata(path)
-                
-                if upload_hdf5:
-                    s3_uri = upload_hdf5_to_bronze(path)
-                    metadata['s3_uri'] = s3_uri
-                    metadata['tiled_uri'] = s3_uri  # Update to S3 URI for Tiled
-                
-                all_metadata.append(metadata)
+                files.append((path, path.stat()))
             else:
                 print(f"⚠ Skipping non-HDF5 file: {path}")
                 
         elif path.is_dir():
             print(f"Scanning directory: {path}")
-            for file_path in path.rglob('*'):
-                if file_path.is_file() and is_hdf5_file(file_path):
-                    print(f"  Processing: {file_path}")
-                    metadata = extract_hdf5_metadata(file_path)
-                    
-                    if upload_hdf5:
-                        s3_uri = upload_hdf5_to_bronze(file_path)
-                        metadata['s3_uri'] = s3_uri
-                        metadata['tiled_uri'] = s3_uri
-                    
-                    all_metadata.append(metadata)
+            files.extend(scan_hdf5_files(path))
         else:
             print(f"⚠ Path not found: {path}")
     
-    if not all_metadata:
+    return files
+
+
+def process_files(paths: List[str], output_path: Path, upload_hdf5: bool = False,
+                  workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Process one or more HDF5 files or directories.
+    
+    Metadata is extracted in a process pool (each process has its own HDF5
+    library lock), while uploads run in a thread pool as results arrive.
+    Records are converted to Arrow every WRITE_BATCH_SIZE files and written to
+    `output_path` once ROW_GROUP_SIZE rows have accumulated, so memory stays
+    bounded by one row group rather than the whole ingest.
+    
+    Args:
+        paths: List of file paths or directory paths
+        output_path: Local Parquet file to write the metadata to
+        upload_hdf5: Whether to upload original HDF5 files to S3
+        workers: Number of extraction processes (default: CPU count)
+        
+    Returns:
+        DataFrame with the summary columns of all processed files
+    """
+    files = collect_hdf5_files(paths)
+    
+    if not files:
         print("⚠ No HDF5 files found to process")
         return pd.DataFrame()
     
-    print(f"\n✓ Processed {len(all_metadata)} HDF5 file(s)")
-    return metadata_to_dataframe(all_metadata)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    summary = []
+    pending = []  # (metadata, upload future or None) not yet converted
+    batches = []  # RecordBatches buffered for the next row group
+    
+    def write_row_group(writer):
+        writer.write_table(pa.Table.from_batches(batches, schema=SCHEMA),
+                           row_group_size=ROW_GROUP_SIZE)
+        batches.clear()
+    
+    def flush(writer):
+        for metadata, upload in pending:
+            if upload is not None:
+                s3_uri = upload.result()
+                metadata['s3_uri'] = s3_uri
+                metadata['tiled_uri'] = s3_uri  # Update to S3 URI for Tiled
+        records = [metadata for metadata, _ in pending]
+        batch = metadata_to_record_batch(records)
+        batches.append(batch)
+        summary.append(metadata_to_dataframe(batch))
+        pending.clear()
+        if sum(b.num_rows for b in batches) >= ROW_GROUP_SIZE:
+            write_row_group(writer)
+    
+    file_paths = [file_path for file_path, _ in files]
+    stats = [st for _, st in files]
+    s3_client = create_s3_client() if upload_hdf5 else None
+    
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as extract_pool, \
+            ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as upload_pool, \
+            pq.ParquetWriter(output_path, SCHEMA, compression='zstd', compression_level=3,
+                             data_page_size=1024 * 1024) as writer:
+        results = extract_pool.map(extract_hdf5_metadata, file_paths, stats, chunksize=8)
+        for file_path, metadata in zip(file_paths, results):
+            print(f"  Processed: {file_path}")
+            upload = upload_pool.submit(upload_hdf5_to_bronze, file_path, s3_client) if upload_hdf5 else None
+            pending.append((metadata, upload))
+            if len(pending) >= WRITE_BATCH_SIZE:
+                flush(writer)
+        
+        if pending:
+            flush(writer)
+        if batches:
+            write_row_group(writer)
+    
+    df = pd.concat(summary, ignore_index=True)
+    print(f"\n✓ Processed {len(df)} HDF5 file(s)")
+    print(f"✓ Saved metadata to {output_path}")
+    return df
 
 
 def main():
@@ -425,6 +630,12 @@ def main():
         action='store_true',
         help='Upload original HDF5 files to MinIO (bronze layer)'
     )
+    parser.add_argument(
+        '--workers', '-j',
+        type=int,
+        default=None,
+        help='Number of metadata extraction processes (default: CPU count)'
+    )
     parser.add_argument(
         '--generate-tiled-config',
         action='store_true',
@@ -433,21 +644,19 @@ def main():
     
     args = parser.parse_args()
     
-    # Process files
-    df = process_files(args.paths, upload_hdf5=args.upload_hdf5)
+    # Process files, streaming metadata to the local Parquet file
+    output_path = Path(args.output)
+    df = process_files(args.paths, output_path, upload_hdf5=args.upload_hdf5, workers=args.workers)
     
     if df.empty:
         print("No files processed. Exiting.")
         return 1
     
-    # Save Parquet locally
-    output_path = Path(args.output)
-    save_parquet_local(df, output_path)
-    
     # Upload to S3 if requested
     if args.upload_metadata:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        s3_key = f"silver/hdf5_metadata/hdf5_metadata_{timestamp}.parquet"
+        # v2/: significant_datasets is list<struct>, unlike the legacy files
+        s3_key = f"silver/hdf5_metadata/v2/hdf5_metadata_{timestamp}.parquet"
         upload_to_s3(output_path, s3_key)
     
     # Generate Tiled config if requested
@@ -471,8 +680,9 @@ def main():
 def generate_tiled_catalog(df: pd.DataFrame, output_path: Path):
     """Generate a Tiled catalog configuration from processed metadata."""
     catalog_entries = []
+    columns = ['file_name', 'tiled_uri', 'title', 'instrument_name', 'sample_name', 'start_time']
     
-    for _, row in df.iterrows():
+    for row in df[columns].to_dict(orient='records'):
         entry = {
             'path': row['file_name'].replace('.', '_').replace('-', '_'),
             'tree': 'tiled.adapters.hdf5:HDF5Adapter.from_uri',
@@ -488,15 +698,19 @@ def generate_tiled_catalog(df: pd.DataFrame, output_path: Path):
         }
         catalog_entries.append(entry)
     
-    # Write YAML config
+    # Write YAML config (libyaml C emitter when available)
     import yaml
+    try:
+        from yaml import CSafeDumper as Dumper
+    except ImportError:
+        from yaml import SafeDumper as Dumper
     config = {
         'trees': catalog_entries
     }
     
     output_path.parent.mkdir(parents=True, exist_ok=True)
     with open(output_path, 'w') as f:
-        yaml.dump(config, f, default_flow_style=False)
+        yaml.dump(config, f, Dumper=Dumper, default_flow_style=False)
     
     print(f"✓ Generated Tiled catalog config: {output_path}")
 
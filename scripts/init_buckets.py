@@ -15,6 +15,7 @@ Usage:
 
 import boto3
 from botocore.client import Config
+from concurrent.futures import ThreadPoolExecutor
 import time
 from dotenv import load_dotenv
 import os
@@ -50,9 +51,10 @@ def create_s3_client():
     )
 
 
-def wait_for_minio(client, max_retries=30, delay=2):
-    """Wait for MinIO to be available."""
+def wait_for_minio(client, max_retries=30, initial_delay=0.25, max_delay=2):
+    """Wait for MinIO to be available, backing off exponentially between attempts."""
     print("Waiting for MinIO to be ready...")
+    delay = initial_delay
     for i in range(max_retries):
         try:
             client.list_buckets()
@@ -61,6 +63,7 @@ def wait_for_minio(client, max_retries=30, delay=2):
         except Exception as e:
             print(f"  Attempt {i+1}/{max_retries}: MinIO not ready yet...")
             time.sleep(delay)
+            delay = min(delay * 2, max_delay)
     raise Exception("MinIO did not become ready in time")
 
 
@@ -98,9 +101,9 @@ def main():
     print(f"\nCreating bucket structure...")
     create_bucket(client, BUCKET_NAME)
     
-    # Create folder prefixes
-    for prefix in PREFIXES:
-        create_prefix(client, BUCKET_NAME, prefix)
+    # Create folder prefixes concurrently (one round-trip each)
+    with ThreadPoolExecutor(max_workers=len(PREFIXES)) as executor:
+        list(executor.map(lambda prefix: create_prefix(client, BUCKET_NAME, prefix), PREFIXES))
     
     print("\n" + "=" * 60)
     print("✓ Bucket initialization complete!")
@@ -13,14 +13,19 @@ Run this inside the Spark container (see bridge_ravendb.py for full command).
 from pyspark.sql import SparkSession
 from pyspark.sql.functions import (
     col, input_file_name, current_timestamp, 
-    regexp_extract, lit
+    instr, lit, substring_index, when
 )
 
+# Optional listing-level filter, e.g. "*.{h5,hdf5,nxs,parquet,json,csv}".
+# None registers every file under bronze/files/.
+PATH_GLOB_FILTER = None
+
 
 def create_spark_session():
     """Create Spark session with Iceberg and Nessie configuration."""
     return SparkSession.builder \
         .appName("File_Inventory") \
+        .config("spark.sql.files.ignoreCorruptFiles", "true") \
         .getOrCreate()
 
 
@@ -49,34 +54,41 @@ def scan_bronze_files(spark):
     Scan the bronze/files/ bucket for all files.
     
     Uses Spark's binaryFile format for efficient metadata-only listing.
+    Returns (df_files, count); df_files is cached so the registry write
+    does not list S3 a second time.
     """
     bronze_path = "s3a://lakehouse/bronze/files/"
     
     try:
-        # Read file metadata (not content) using binaryFile format
-        df = spark.read.format("binaryFile") \
-            .option("pathGlobFilter", "*") \
-            .option("recursiveFileLookup", "true") \
-            .load(bronze_path)
+        # Read file metadata using binaryFile format; selecting only metadata
+        # columns up front prunes `content`, so file bodies are never fetched
+        reader = spark.read.format("binaryFile") \
+            .option("recursiveFileLookup", "true")
+        if PATH_GLOB_FILTER:
+            reader = reader.option("pathGlobFilter", PATH_GLOB_FILTER)
+        df = reader.load(bronze_path).select("path", "length", "modificationTime")
         
-        # Extract useful metadata
+        # Extract useful metadata with plain string functions (no regex)
+        file_name = substring_index(col("path"), "/", -1)
         df_files = df.select(
             col("path").alias("file_path"),
-            regexp_extract(col("path"), r"[^/]+$", 0).alias("file_name"),
-            regexp_extract(col("path"), r"\.([^.]+)$", 1).alias("file_extension"),
+            file_name.alias("file_name"),
+            when(instr(file_name, ".") > 0, substring_index(file_name, ".", -1))
+                .otherwise(lit("")).alias("file_extension"),
             col("length").alias("size_bytes"),
             current_timestamp().alias("ingested_at")
         )
         
+        df_files = df_files.cache()
         count = df_files.count()
         print(f"✓ Found {count} files in bronze layer")
-        return df_files
+        return df_files, count
         
     except Exception as e:
         if "Path does not exist" in str(e) or "No such file" in str(e):
             print("⚠ No files found in bronze/files/")
             print("  Creating empty registry. Add files and re-run to index them.")
-            return None
+            return None, 0
         raise
 
 
@@ -173,12 +185,13 @@ def main():
     
     # Scan bronze files
     print("\nScanning bronze layer for files...")
-    df_files = scan_bronze_files(spark)
+    df_files, file_count = scan_bronze_files(spark)
     
-    if df_files is not None and df_files.count() > 0:
+    if file_count > 0:
         # Use simple append for demo (change to use_write_audit_publish for prod)
         print("\nRegistering files in Iceberg...")
         simple_append(spark, df_files)
+        df_files.unpersist()
         
         # Show stats
         show_registry_stats(spark)
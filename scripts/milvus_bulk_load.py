@@ -19,6 +19,7 @@ from typing import List
 
 import boto3
 from botocore.client import Config
+import numpy as np
 import pandas as pd
 
 try:
@@ -129,9 +130,15 @@ def load_vectors_from_minio(s3_client) -> pd.DataFrame:
         obj = s3_client.get_object(Bucket=BUCKET_NAME, Key=VECTORS_PATH)
         df = pd.read_parquet(io.BytesIO(obj['Body'].read()))
         print(f"  ✓ Loaded {len(df)} vectors")
-        return df
     except Exception as e:
         raise ValueError(f"Failed to read vectors: {e}. Run generate_embeddings.py first.")
+    
+    # generate_embeddings.py writes int8 vectors with a per-vector scale
+    if 'vector_int8' in df.columns:
+        q = np.stack(df['vector_int8'].to_numpy()).astype(np.float32)
+        df['vector'] = list(q / df['vector_scale'].to_numpy()[:, None])
+        print("  ✓ Dequantized int8 vectors")
+    return df
 
 
 def insert_vectors(collection: Collection, df: pd.DataFrame):
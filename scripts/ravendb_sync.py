@@ -6,36 +6,44 @@ This script provides an alternative to RavenDB Enterprise's OLAP ETL feature.
 It reads documents from RavenDB, flattens them, and writes Parquet files to MinIO.
 
 The output mimics what RavenDB OLAP ETL would produce:
-  s3://lakehouse/silver/ravendb_landing/orders/{date}/data.parquet
+  s3://lakehouse/silver/ravendb_landing/orders/partition_date={date}/part-0.parquet
 
 Usage:
-  pip install ravendb pyarrow boto3 pandas
+  pip install ravendb pyarrow boto3
   python ravendb_sync.py
+
+  # Install the ravendb client first if it is missing
+  python ravendb_sync.py --install-missing
 """
 
+import argparse
+import importlib
 import os
-import io
-import time
+import json
+import subprocess
+import sys
 from datetime import datetime
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Dict, Any, Tuple
+from urllib.parse import urlparse
 
 import boto3
 from botocore.client import Config
-import pandas as pd
 import pyarrow as pa
-import pyarrow.parquet as pq
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from pyarrow import fs as pafs
 
 try:
     from ravendb import DocumentStore
 except ImportError:
-    print("Installing ravendb package...")
-    import subprocess
-    subprocess.check_call(["pip", "install", "ravendb"])
-    from ravendb import DocumentStore
+    # Only installed on request (--install-missing); main() fails fast otherwise
+    DocumentStore = None
 
-# Load environment variables
-from dotenv import load_dotenv
-load_dotenv()
+# Load environment variables when run as a script (before reading configuration)
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    load_dotenv()
 
 # Configuration
 RAVENDB_URL = os.getenv('RAVENDB_URL', 'http://localhost:8080')
@@ -46,25 +54,101 @@ MINIO_ACCESS_KEY = os.getenv('AWS_ACCESS_KEY_ID', 'admin')
 MINIO_SECRET_KEY = os.getenv('AWS_SECRET_ACCESS_KEY', 'password')
 BUCKET_NAME = "lakehouse"
 LANDING_ZONE_PREFIX = "silver/ravendb_landing/orders"
+MANIFEST_PREFIX = "silver/ravendb_landing/_manifests/orders"
+
+# Shared fallbacks so documents without ShipTo/Lines don't allocate per row
+_EMPTY: Dict[str, Any] = {}
+_EMPTY_LINES: List[Dict[str, Any]] = []
+
+# datetime.fromisoformat only understands a trailing "Z" from Python 3.11
+_NEEDS_Z_REWRITE = sys.version_info < (3, 11)
+
+# Low-cardinality columns worth dictionary-encoding in the landing zone
+DICTIONARY_COLUMNS = ["CustomerId", "Status", "ShipCity", "ShipCountry"]
+
+# Rows per landing-zone file (and row group) before Arrow rolls over to a new part
+MAX_ROWS_PER_FILE = 1_000_000
+
+# Parquet writer options shared by every landing-zone file
+PARQUET_WRITE_OPTIONS = ds.ParquetFileFormat().make_write_options(
+    compression='zstd',
+    compression_level=3,
+    use_dictionary=DICTIONARY_COLUMNS,
+    write_statistics=True,
+    data_page_size=1 << 20,
+)
 
-BATCH_SIZE = 100
+# Landing-zone Parquet schema (what RavenDB OLAP ETL would produce)
+ORDERS_SCHEMA = pa.schema([
+    pa.field("OrderId", pa.string()),
+    pa.field("CustomerId", pa.string()),
+    pa.field("OrderDate", pa.timestamp("ms")),
+    pa.field("TotalAmount", pa.float64()),
+    pa.field("Status", pa.string()),
+    pa.field("ShipCity", pa.string()),
+    pa.field("ShipCountry", pa.string()),
+    pa.field("LineCount", pa.int64()),
+    pa.field("SyncedAt", pa.timestamp("ms")),
+])
 
 
+@lru_cache(maxsize=1)
 def create_s3_client():
-    """Create a boto3 S3 client configured for MinIO."""
+    """
+    Create a boto3 S3 client configured for MinIO.
+    
+    Cached per process so the main flow and writer threads share one pool.
+    """
     return boto3.client(
         "s3",
         endpoint_url=MINIO_ENDPOINT,
         aws_access_key_id=MINIO_ACCESS_KEY,
         aws_secret_access_key=MINIO_SECRET_KEY,
-        config=Config(signature_version="s3v4"),
+        config=Config(
+            signature_version="s3v4",
+            max_pool_connections=64,
+            retries={'max_attempts': 5, 'mode': 'adaptive'},
+            tcp_keepalive=True,
+        ),
         region_name="us-east-1",
     )
 
 
-def flatten_order(doc: Dict[str, Any], doc_id: str) -> Dict[str, Any]:
+@lru_cache(maxsize=1)
+def create_arrow_filesystem() -> pafs.S3FileSystem:
+    """Create a PyArrow S3 filesystem configured for MinIO (cached per process)."""
+    endpoint = urlparse(MINIO_ENDPOINT)
+    return pafs.S3FileSystem(
+        endpoint_override=endpoint.netloc,
+        scheme=endpoint.scheme or "http",
+        access_key=MINIO_ACCESS_KEY,
+        secret_key=MINIO_SECRET_KEY,
+        region="us-east-1",
+        retry_strategy=pafs.AwsStandardS3RetryStrategy(max_attempts=5),
+    )
+
+
+def _parse_order_date(value: Any, now: datetime) -> datetime:
+    """Parse a RavenDB OrderDate, falling back to ``now`` for missing or malformed values."""
+    if not isinstance(value, str):
+        return now if value is None else value
+    # Fixed-position pre-filter for YYYY-MM-DD instead of catching ValueError per row
+    if len(value) < 10 or value[4] != "-" or value[7] != "-":
+        return now
+    if _NEEDS_Z_REWRITE and value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        # e.g. "2024-13-40" passes the pre-filter but is not a real date
+        return now
+
+
+def flatten_orders_to_columns(
+    docs: Iterable[Tuple[str, Dict[str, Any]]]
+) -> Dict[str, List[Any]]:
     """
-    Flatten a RavenDB order document for columnar storage.
+    Flatten RavenDB order documents into one list per ORDERS_SCHEMA column.
     
     This mimics the RavenDB OLAP ETL script from the lakehouse.md spec:
     ```javascript
@@ -77,116 +161,189 @@ def flatten_order(doc: Dict[str, Any], doc_id: str) -> Dict[str, Any]:
     });
     ```
     """
-    # Calculate total if not pre-computed
-    total_amount = doc.get("TotalAmount", 0)
-    if not total_amount and "Lines" in doc:
-        total_amount = sum(
-            line.get("Price", 0) * line.get("Quantity", 0)
-            for line in doc.get("Lines", [])
-        )
+    order_ids, customer_ids, order_dates, totals = [], [], [], []
+    statuses, ship_cities, ship_countries, line_counts = [], [], [], []
+    _now = datetime.now()
     
-    # Parse order date for partitioning
-    order_date_str = doc.get("OrderDate", datetime.now().isoformat())
-    if isinstance(order_date_str, str):
-        try:
-            order_date = datetime.fromisoformat(order_date_str.replace("Z", "+00:00"))
-        except ValueError:
-            order_date = datetime.now()
-    else:
-        order_date = order_date_str
+    for doc_id, doc in docs:
+        get = doc.get
+        lines = get("Lines") or _EMPTY_LINES
+        ship = get("ShipTo") or _EMPTY
+        
+        # Calculate total if not pre-computed
+        total_amount = get("TotalAmount", 0)
+        if not total_amount and lines:
+            total_amount = sum(
+                line.get("Price", 0) * line.get("Quantity", 0)
+                for line in lines
+            )
+        
+        order_ids.append(doc_id)
+        customer_ids.append(get("CustomerId", ""))
+        order_dates.append(_parse_order_date(get("OrderDate"), _now))
+        totals.append(total_amount)
+        statuses.append(get("Status", "Unknown"))
+        ship_cities.append(ship.get("City", ""))
+        ship_countries.append(ship.get("Country", ""))
+        line_counts.append(len(lines))
     
     return {
-        "OrderId": doc_id,
-        "CustomerId": doc.get("CustomerId", ""),
-        "OrderDate": order_date,
-        "TotalAmount": round(total_amount, 2),
-        "Status": doc.get("Status", "Unknown"),
-        "ShipCity": doc.get("ShipTo", {}).get("City", ""),
-        "ShipCountry": doc.get("ShipTo", {}).get("Country", ""),
-        "LineCount": len(doc.get("Lines", [])),
-        # Metadata for tracking
-        "SyncedAt": datetime.now(),
+        "OrderId": order_ids,
+        "CustomerId": customer_ids,
+        "OrderDate": order_dates,
+        "TotalAmount": totals,
+        "Status": statuses,
+        "ShipCity": ship_cities,
+        "ShipCountry": ship_countries,
+        "LineCount": line_counts,
+        # Metadata for tracking; every row of a sync shares one timestamp
+        "SyncedAt": [_now] * len(order_ids),
     }
 
 
-def fetch_all_orders(store: DocumentStore) -> List[Dict[str, Any]]:
-    """Fetch all orders from RavenDB."""
-    orders = []
+def iter_order_documents(store: DocumentStore) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream (id, document) pairs for every order in RavenDB.
     
+    Uses server-side streaming, so documents are yielded as they arrive and
+    are not tracked by the session.
+    """
     with store.open_session() as session:
-        # Stream all documents from Orders collection
         query = session.query_collection("Orders")
         
-        for doc in query:
-            # Get document ID from metadata
-            doc_id = session.advanced.get_document_id(doc)
-            flattened = flatten_order(doc.__dict__, doc_id)
-            orders.append(flattened)
-    
-    return orders
-
-
-def group_by_date(orders: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
-    """Group orders by date for partitioned storage."""
-    grouped = {}
-    for order in orders:
-        date_key = order["OrderDate"].strftime("%Y-%m-%d")
-        if date_key not in grouped:
-            grouped[date_key] = []
-        grouped[date_key].append(order)
-    return grouped
-
-
-def write_parquet_to_minio(
-    s3_client,
-    orders: List[Dict[str, Any]],
-    date_partition: str
-):
-    """Write orders to a Parquet file in MinIO."""
-    # Convert to DataFrame
-    df = pd.DataFrame(orders)
-    
-    # Round timestamps to milliseconds for Spark compatibility
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.floor('ms')
-    
-    # Define explicit schema with timestamp(ms) instead of timestamp(ns)
-    schema_fields = []
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            # Use millisecond timestamps for Spark compatibility
-            schema_fields.append(pa.field(col, pa.timestamp('ms')))
-        elif pd.api.types.is_integer_dtype(df[col]):
-            schema_fields.append(pa.field(col, pa.int64()))
-        elif pd.api.types.is_float_dtype(df[col]):
-            schema_fields.append(pa.field(col, pa.float64()))
-        else:
-            schema_fields.append(pa.field(col, pa.string()))
-    
-    schema = pa.schema(schema_fields)
-    
-    # Convert to PyArrow Table with explicit schema
-    table = pa.Table.from_pandas(df, schema=schema)
-    
-    # Write to in-memory buffer
-    buffer = io.BytesIO()
-    pq.write_table(table, buffer, compression='snappy')
-    buffer.seek(0)
-    
-    # Upload to MinIO
-    key = f"{LANDING_ZONE_PREFIX}/{date_partition}/data.parquet"
+        for result in session.advanced.stream(query):
+            doc = result.document
+            yield result.key, doc if isinstance(doc, dict) else doc.__dict__
+
+
+def build_orders_table(columns: Dict[str, List[Any]]) -> pa.Table:
+    """Build the landing-zone Arrow table from flattened order columns."""
+    # timestamp('ms') truncates to milliseconds for Spark compatibility
+    arrays = [pa.array(columns[field.name], type=field.type) for field in ORDERS_SCHEMA]
+    
+    # Round totals to cents in one vectorized pass instead of per order.
+    # Rounding whole cents and dividing by 100 yields the nearest double
+    # (pc.round(ndigits=2) can leave values like 849.8100000000001)
+    total_index = ORDERS_SCHEMA.get_field_index("TotalAmount")
+    cents = pc.round(pc.multiply(arrays[total_index], 100.0))
+    arrays[total_index] = pc.divide(cents, 100.0)
+    
+    return pa.Table.from_arrays(arrays, schema=ORDERS_SCHEMA)
+
+
+def write_partitioned_parquet(
+    filesystem: pafs.S3FileSystem,
+    orders: pa.Table
+) -> List[str]:
+    """
+    Write orders to MinIO as a Hive-partitioned Parquet dataset.
+    
+    Arrow splits the table by `partition_date`, encodes the partitions in
+    parallel and streams each file to S3. Returns the written object keys.
+    """
+    # Sorting by OrderDate keeps the row-group min/max statistics tight so
+    # Spark/Trino can skip row groups on narrower date ranges
+    orders = orders.sort_by("OrderDate")
+    orders = orders.append_column(
+        "partition_date", pc.strftime(orders.column("OrderDate"), format="%Y-%m-%d")
+    )
+    
+    files_written = []
+    
+    def record_file(written_file):
+        key = written_file.path[len(BUCKET_NAME) + 1:]
+        files_written.append(key)
+        print(f"  ✓ s3://{BUCKET_NAME}/{key} ({written_file.metadata.num_rows} orders)")
+    
+    ds.write_dataset(
+        orders,
+        base_dir=f"{BUCKET_NAME}/{LANDING_ZONE_PREFIX}",
+        filesystem=filesystem,
+        format="parquet",
+        partitioning=["partition_date"],
+        partitioning_flavor="hive",
+        file_options=PARQUET_WRITE_OPTIONS,
+        max_rows_per_file=MAX_ROWS_PER_FILE,
+        max_rows_per_group=MAX_ROWS_PER_FILE,
+        existing_data_behavior="overwrite_or_ignore",
+        create_dir=False,  # S3 has no directories; skip empty marker objects
+        file_visitor=record_file,
+    )
+    
+    return files_written
+
+
+def remove_legacy_landing_files(s3_client) -> int:
+    """
+    Delete `{date}/data.parquet` objects left by the pre-Hive landing layout.
+    
+    Readers that scan the landing zone would otherwise see every order twice.
+    Only one delimiter listing is needed once the legacy files are gone.
+    """
+    paginator = s3_client.get_paginator("list_objects_v2")
+    legacy_keys = [
+        {"Key": f"{common['Prefix']}data.parquet"}
+        for page in paginator.paginate(
+            Bucket=BUCKET_NAME, Prefix=f"{LANDING_ZONE_PREFIX}/", Delimiter="/"
+        )
+        for common in page.get("CommonPrefixes", [])
+        if not common["Prefix"][len(LANDING_ZONE_PREFIX) + 1:].startswith("partition_date=")
+    ]
+    
+    # DeleteObjects accepts at most 1000 keys per request
+    for start in range(0, len(legacy_keys), 1000):
+        s3_client.delete_objects(
+            Bucket=BUCKET_NAME,
+            Delete={"Objects": legacy_keys[start:start + 1000], "Quiet": True}
+        )
+    return len(legacy_keys)
+
+
+def write_sync_manifest(s3_client, keys: List[str]) -> str:
+    """
+    Publish the list of files written by this sync.
+    
+    bridge_ravendb.py consumes these manifests to read only new files instead
+    of listing the whole landing zone, and deletes them after a successful MERGE.
+    """
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    key = f"{MANIFEST_PREFIX}/{run_id}.json"
     s3_client.put_object(
         Bucket=BUCKET_NAME,
         Key=key,
-        Body=buffer.getvalue(),
-        ContentType="application/octet-stream"
+        Body=json.dumps({"files": keys}).encode("utf-8"),
+        ContentType="application/json"
     )
-    
     return key
 
 
-def main():
+def ensure_ravendb():
+    """Install and import the ravendb client if it is missing."""
+    global DocumentStore
+    if DocumentStore is not None:
+        return
+    
+    print("Installing ravendb package...")
+    subprocess.check_call([sys.executable, "-m", "pip", "install", "ravendb"])
+    importlib.invalidate_caches()
+    from ravendb import DocumentStore as document_store
+    DocumentStore = document_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync RavenDB orders to the Parquet landing zone")
+    parser.add_argument(
+        '--install-missing',
+        action='store_true',
+        help='pip install the ravendb client if it is not already installed'
+    )
+    args = parser.parse_args(argv)
+    
+    if args.install_missing:
+        ensure_ravendb()
+    elif DocumentStore is None:
+        raise ImportError("ravendb is not installed; run 'pip install ravendb' or pass --install-missing")
+    
     print("=" * 60)
     print("RavenDB → Parquet Sync (Community Edition)")
     print("=" * 60)
@@ -199,33 +356,33 @@ def main():
     # Initialize MinIO client
     print("Connecting to MinIO...")
     s3_client = create_s3_client()
+    filesystem = create_arrow_filesystem()
     
-    # Fetch all orders
-    print("\nFetching orders from RavenDB...")
-    orders = fetch_all_orders(store)
-    print(f"  ✓ Found {len(orders)} orders")
+    # Stream orders into a single Arrow table
+    print("\nStreaming orders from RavenDB...")
+    orders = build_orders_table(flatten_orders_to_columns(iter_order_documents(store)))
+    order_count = orders.num_rows
+    print(f"  ✓ Found {order_count} orders")
     
-    if not orders:
+    if not order_count:
         print("\n⚠ No orders found. Run seed_ravendb.py first.")
         return
     
-    # Group by date for partitioned storage
-    print("\nGrouping orders by date...")
-    grouped = group_by_date(orders)
-    print(f"  ✓ {len(grouped)} date partitions")
-    
     # Write Parquet files
     print("\nWriting Parquet files to MinIO...")
-    files_written = []
-    for date_partition, date_orders in grouped.items():
-        key = write_parquet_to_minio(s3_client, date_orders, date_partition)
-        files_written.append(key)
-        print(f"  ✓ s3://{BUCKET_NAME}/{key} ({len(date_orders)} orders)")
+    files_written = write_partitioned_parquet(filesystem, orders)
+    
+    removed = remove_legacy_landing_files(s3_client)
+    if removed:
+        print(f"  ✓ Removed {removed} legacy {{date}}/data.parquet file(s)")
+    
+    manifest_key = write_sync_manifest(s3_client, files_written)
+    print(f"  ✓ Manifest: s3://{BUCKET_NAME}/{manifest_key}")
     
     print("\n" + "=" * 60)
     print("✓ Sync complete!")
     print("=" * 60)
-    print(f"\nTotal orders synced: {len(orders)}")
+    print(f"\nTotal orders synced: {order_count}")
     print(f"Parquet files created: {len(files_written)}")
     print(f"\nLanding zone: s3://{BUCKET_NAME}/{LANDING_ZONE_PREFIX}/")
     print("\nNext step: Run bridge_ravendb.py to merge into Iceberg")
@@ -11,8 +11,9 @@ Usage:
 
 import random
 import time
+from itertools import accumulate
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Tuple
 import json
 import requests
 from dotenv import load_dotenv
@@ -21,11 +22,23 @@ import os
 # Load environment variables
 load_dotenv()
 
+try:
+    import orjson
+    
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+except ImportError:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
 # RavenDB Configuration
 RAVENDB_URL = os.getenv('RAVENDB_URL', 'http://localhost:8080')
 DATABASE_NAME = "Northwind"
 NUM_ORDERS = 500
 
+# Flush batched PUT commands once their JSON body reaches this size
+MAX_BATCH_BYTES = 8 * 1024 * 1024
+
 # Sample data for generating realistic orders
 CUSTOMERS = [f"customers/{i}-A" for i in range(1, 51)]
 PRODUCTS = [
@@ -42,6 +55,12 @@ PRODUCTS = [
 ]
 STATUSES = ["Pending", "Processing", "Shipped", "Delivered", "Cancelled"]
 STATUS_WEIGHTS = [0.1, 0.15, 0.25, 0.45, 0.05]
+RECENT_STATUS_WEIGHTS = [0.3, 0.3, 0.2, 0.15, 0.05]
+SHIP_CITIES = ["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Seattle", "Denver", "Boston"]
+
+# Cumulative weights so random.choices doesn't re-accumulate them per order
+STATUS_CUM_WEIGHTS = list(accumulate(STATUS_WEIGHTS))
+RECENT_STATUS_CUM_WEIGHTS = list(accumulate(RECENT_STATUS_WEIGHTS))
 
 
 def wait_for_ravendb(max_retries=30, delay=2):
@@ -119,20 +138,23 @@ def generate_order_lines() -> List[Dict[str, Any]]:
     return lines
 
 
-def generate_order(order_num: int) -> Dict[str, Any]:
-    """Generate a single order document."""
+def generate_order(order_num: int, now: datetime = None) -> Dict[str, Any]:
+    """Generate a single order document, dated relative to ``now``."""
+    if now is None:
+        now = datetime.now()
+    
     # Random date in the last 2 years
     days_ago = random.randint(0, 730)
-    order_date = datetime.now() - timedelta(days=days_ago)
+    order_date = now - timedelta(days=days_ago)
     
     lines = generate_order_lines()
     total = sum(line["Price"] * line["Quantity"] for line in lines)
     
     # Status weighted toward completed orders for older orders
     if days_ago > 30:
-        status = random.choices(STATUSES, weights=STATUS_WEIGHTS)[0]
+        status = random.choices(STATUSES, cum_weights=STATUS_CUM_WEIGHTS)[0]
     else:
-        status = random.choices(STATUSES, weights=[0.3, 0.3, 0.2, 0.15, 0.05])[0]
+        status = random.choices(STATUSES, cum_weights=RECENT_STATUS_CUM_WEIGHTS)[0]
     
     return {
         "@metadata": {
@@ -146,31 +168,39 @@ def generate_order(order_num: int) -> Dict[str, Any]:
         "Lines": lines,
         "TotalAmount": round(total, 2),
         "ShipTo": {
-            "City": random.choice(["New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Seattle", "Denver", "Boston"]),
+            "City": random.choice(SHIP_CITIES),
             "Country": "USA"
         },
         "Notes": f"Order generated for demo purposes. Batch {order_num // 100 + 1}."
     }
 
 
-def store_document(doc_id: str, document: Dict[str, Any]):
-    """Store a document in RavenDB using REST API."""
-    url = f"{RAVENDB_URL}/databases/{DATABASE_NAME}/docs"
-    params = {"id": doc_id}
-    headers = {
-        'Content-Type': 'application/json',
-        'Accept-Encoding': 'identity'  # Disable compression
-    }
+def iter_command_batches(
+    documents: Iterable[Tuple[str, Dict[str, Any]]],
+    max_bytes: int = MAX_BATCH_BYTES
+) -> Iterator[List[bytes]]:
+    """Serialize documents into PUT commands, grouped by encoded size rather than count."""
+    batch, batch_bytes = [], 0
+    for doc_id, document in documents:
+        command = dumps({"Id": doc_id, "Type": "PUT", "Document": document, "ChangeVector": None})
+        if batch and batch_bytes + len(command) > max_bytes:
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(command)
+        batch_bytes += len(command) + 1
+    if batch:
+        yield batch
+
+
+def store_batch(session: requests.Session, commands: List[bytes]):
+    """Store a batch of pre-serialized PUT commands in one RavenDB bulk_docs request."""
+    url = f"{RAVENDB_URL}/databases/{DATABASE_NAME}/bulk_docs"
+    body = b'{"Commands":[' + b",".join(commands) + b"]}"
     
-    resp = requests.put(
-        url,
-        params=params,
-        json=document,
-        headers=headers
-    )
+    resp = session.post(url, data=body)
     
     if resp.status_code not in [200, 201]:
-        raise Exception(f"Failed to store document {doc_id}: {resp.status_code} - {resp.text}")
+        raise Exception(f"Failed to store batch of {len(commands)} documents: {resp.status_code} - {resp.text}")
 
 
 def main():
@@ -183,14 +213,23 @@ def main():
     
     print(f"\nGenerating and inserting {NUM_ORDERS} sample orders...")
     
-    # Insert orders using REST API
-    for i in range(NUM_ORDERS):
-        order = generate_order(i)
-        order_id = f"orders/{i+1:04d}-A"
-        store_document(order_id, order)
-        
-        if (i + 1) % 100 == 0:
-            print(f"  ✓ Inserted {i + 1} orders...")
+    # Insert orders using batched REST commands; all orders are dated relative to one timestamp
+    now = datetime.now()
+    orders = (
+        (f"orders/{i+1:04d}-A", generate_order(i, now))
+        for i in range(NUM_ORDERS)
+    )
+    
+    inserted = 0
+    with requests.Session() as session:
+        session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'identity'  # Disable compression
+        })
+        for commands in iter_command_batches(orders):
+            store_batch(session, commands)
+            inserted += len(commands)
+            print(f"  ✓ Inserted {inserted} orders...")
     
     print(f"\n✓ Successfully inserted {NUM_ORDERS} orders into RavenDB")
     
@@ -22,6 +22,9 @@ Usage:
   # Start server using metadata catalog from Iceberg
   python serve_tiled.py --catalog /path/to/hdf5_metadata.parquet
 
+  # Limit the number of worker processes (default: one per CPU)
+  python serve_tiled.py --s3 --workers 4
+
 Requirements:
   pip install tiled[all] h5py pandas pyarrow boto3
   
@@ -31,10 +34,14 @@ Documentation:
 """
 
 import argparse
+import json
 import os
 import sys
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Iterator, Optional
 
 # Tiled imports
 try:
@@ -49,6 +56,7 @@ except ImportError as e:
     sys.exit(1)
 
 import pandas as pd
+import pyarrow.parquet as pq
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -58,12 +66,31 @@ load_dotenv()
 DEFAULT_HOST = "0.0.0.0"
 DEFAULT_PORT = 8000
 
+# Environment variable carrying CLI arguments to uvicorn worker processes
+WORKER_ARGV_ENV = "SERVE_TILED_ARGV"
+
+# File extensions served as HDF5/NeXus (matched with a single str.endswith)
+_HDF5_EXTS = ('.h5', '.hdf5', '.nxs', '.nx5')
+
+# Columns read from the ingest_hdf5.py metadata catalog, streamed in batches
+CATALOG_COLUMNS = [
+    'tiled_uri', 'file_path', 'file_name', 'title',
+    'instrument_name', 'sample_name', 'start_time', 'file_size_bytes',
+]
+CATALOG_BATCH_SIZE = 4096
+
+# Concurrent adapter construction for the S3 catalog
+S3_ADAPTER_WORKERS = 16
+
+# Demo catalog data
+DEMO_SEED = 0
+DEMO_ARRAY_SHAPE = (100, 100)
+
 
+@lru_cache(maxsize=None)
 def path_to_uri(file_path: str) -> str:
     """Convert a file path to a file:// URI."""
-    from pathlib import Path
-    abs_path = Path(file_path).resolve()
-    return f"file://{abs_path}"
+    return Path(file_path).resolve().as_uri()
 
 
 def create_hdf5_adapter(file_path: str) -> HDF5Adapter:
@@ -71,36 +98,48 @@ def create_hdf5_adapter(file_path: str) -> HDF5Adapter:
     return HDF5Adapter.from_uris(path_to_uri(file_path))
 
 
+def unique_key(key: str, seen: Counter) -> str:
+    """Return ``key``, or ``key_N`` if it is already taken, and record it in ``seen``."""
+    n = seen[key]
+    unique = f"{key}_{n}" if n else key
+    while seen[unique]:
+        n += 1
+        unique = f"{key}_{n}"
+    seen[key] = n + 1
+    if unique != key:
+        seen[unique] += 1
+    return unique
+
+
+def scan_hdf5_files(directory: Path) -> Iterator[Path]:
+    """Recursively yield HDF5/NeXus files under a directory using os.scandir."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan_hdf5_files(Path(entry.path))
+            elif entry.name.lower().endswith(_HDF5_EXTS) and entry.is_file():
+                yield Path(entry.path)
+
+
 def create_local_catalog(data_dir: Path) -> MapAdapter:
     """
     Create a Tiled catalog from local HDF5 files.
     
     Scans the directory for HDF5/NeXus files and creates adapters.
     """
-    hdf5_extensions = {'.h5', '.hdf5', '.nxs', '.nx5'}
-    
     adapters = {}
+    seen = Counter()
     
-    for file_path in data_dir.rglob('*'):
-        if file_path.is_file():
-            suffixes = ''.join(file_path.suffixes).lower()
-            if any(suffixes.endswith(ext) for ext in hdf5_extensions):
-                # Create a safe key name
-                key = file_path.stem.replace('.', '_').replace('-', '_')
-                
-                # Ensure unique keys
-                base_key = key
-                counter = 1
-                while key in adapters:
-                    key = f"{base_key}_{counter}"
-                    counter += 1
-                
-                try:
-                    file_uri = path_to_uri(str(file_path))
-                    adapters[key] = HDF5Adapter.from_uris(file_uri)
-                    print(f"  ✓ Loaded: {key} -> {file_path}")
-                except Exception as e:
-                    print(f"  ⚠ Failed to load {file_path}: {e}")
+    for file_path in scan_hdf5_files(data_dir):
+        # Create a safe, unique key name
+        key = unique_key(file_path.stem.replace('.', '_').replace('-', '_'), seen)
+        
+        try:
+            file_uri = path_to_uri(str(file_path))
+            adapters[key] = HDF5Adapter.from_uris(file_uri)
+            print(f"  ✓ Loaded: {key} -> {file_path}")
+        except Exception as e:
+            print(f"  ⚠ Failed to load {file_path}: {e}")
     
     print(f"\n✓ Created catalog with {len(adapters)} entries")
     return MapAdapter(adapters)
@@ -113,49 +152,48 @@ def create_catalog_from_parquet(parquet_path: Path) -> MapAdapter:
     This uses the metadata extracted by ingest_hdf5.py to build
     the serving catalog.
     """
-    df = pd.read_parquet(parquet_path)
+    parquet_file = pq.ParquetFile(parquet_path)
     
     adapters = {}
+    seen = Counter()
     
-    for _, row in df.iterrows():
-        file_path = row.get('tiled_uri') or row.get('file_path')
+    for batch in parquet_file.iter_batches(batch_size=CATALOG_BATCH_SIZE, columns=CATALOG_COLUMNS):
+        # Pull each column out as a Python list once per batch
+        columns = [batch.column(name).to_pylist() for name in CATALOG_COLUMNS]
         
-        # Ensure we have a proper file:// URI
-        if file_path.startswith('file://'):
-            file_uri = file_path
-        elif file_path.startswith('s3://'):
-            file_uri = file_path  # S3 URIs are handled differently
-        else:
-            file_uri = path_to_uri(file_path)
-        
-        # Create safe key name
-        key = Path(row['file_name']).stem.replace('.', '_').replace('-', '_')
-        
-        # Ensure unique keys
-        base_key = key
-        counter = 1
-        while key in adapters:
-            key = f"{base_key}_{counter}"
-            counter += 1
-        
-        try:
-            # Add metadata from the catalog
-            metadata = {
-                'file_name': row.get('file_name', ''),
-                'title': row.get('title', ''),
-                'instrument': row.get('instrument_name', ''),
-                'sample': row.get('sample_name', ''),
-                'start_time': row.get('start_time', ''),
-                'file_size_bytes': row.get('file_size_bytes', 0),
-            }
+        for (tiled_uri, file_path, file_name, title, instrument,
+             sample, start_time, file_size) in zip(*columns):
+            file_path = tiled_uri or file_path
             
-            adapters[key] = HDF5Adapter.from_uris(
-                file_uri,
-                metadata=metadata
-            )
-            print(f"  ✓ Loaded: {key}")
-        except Exception as e:
-            print(f"  ⚠ Failed to load {file_path}: {e}")
+            # Ensure we have a proper file:// URI
+            if file_path.startswith('file://'):
+                file_uri = file_path
+            elif file_path.startswith('s3://'):
+                file_uri = file_path  # S3 URIs are handled differently
+            else:
+                file_uri = path_to_uri(file_path)
+            
+            # Create safe, unique key name
+            key = unique_key(Path(file_name).stem.replace('.', '_').replace('-', '_'), seen)
+            
+            try:
+                # Add metadata from the catalog
+                metadata = {
+                    'file_name': file_name,
+                    'title': title,
+                    'instrument': instrument,
+                    'sample': sample,
+                    'start_time': start_time,
+                    'file_size_bytes': file_size,
+                }
+                
+                adapters[key] = HDF5Adapter.from_uris(
+                    file_uri,
+                    metadata=metadata
+                )
+                print(f"  ✓ Loaded: {key}")
+            except Exception as e:
+                print(f"  ⚠ Failed to load {file_path}: {e}")
     
     print(f"\n✓ Created catalog with {len(adapters)} entries from Parquet")
     return MapAdapter(adapters)
@@ -185,49 +223,56 @@ def create_s3_catalog() -> MapAdapter:
         region_name='us-east-1',
     )
     
+    # One set of storage options for every file, so fsspec reuses a single
+    # cached s3fs filesystem (and its connection pool) across adapters
+    storage_options = {
+        'key': access_key,
+        'secret': secret_key,
+        'client_kwargs': {'endpoint_url': minio_endpoint}
+    }
+    
     adapters = {}
+    pending = []
     
-    try:
-        paginator = client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-            for obj in page.get('Contents', []):
-                key = obj['Key']
-                file_name = key.split('/')[-1]
-                
-                # Skip non-HDF5 files
-                suffixes = ''.join(Path(file_name).suffixes).lower()
-                if not any(suffixes.endswith(ext) for ext in {'.h5', '.hdf5', '.nxs'}):
-                    continue
-                
-                # Create adapter key
-                adapter_key = Path(file_name).stem.replace('.', '_').replace('-', '_')
-                
-                # For S3, we need to use fsspec
-                s3_uri = f"s3://{bucket_name}/{key}"
-                
-                try:
-                    # Configure S3 filesystem
-                    import s3fs
-                    fs = s3fs.S3FileSystem(
-                        key=access_key,
-                        secret=secret_key,
-                        client_kwargs={'endpoint_url': minio_endpoint}
-                    )
+    # Opening an adapter is I/O-bound on MinIO round trips, so open them concurrently
+    with ThreadPoolExecutor(max_workers=S3_ADAPTER_WORKERS) as executor:
+        try:
+            paginator = client.get_paginator('list_objects_v2')
+            pages = paginator.paginate(
+                Bucket=bucket_name,
+                Prefix=prefix,
+                PaginationConfig={'PageSize': 1000},
+            )
+            for page in pages:
+                for obj in page.get('Contents', []):
+                    key = obj['Key']
+                    file_name = key.split('/')[-1]
+                    
+                    # Skip non-HDF5 files
+                    if not file_name.lower().endswith(_HDF5_EXTS):
+                        continue
+                    
+                    # Create adapter key
+                    adapter_key = Path(file_name).stem.replace('.', '_').replace('-', '_')
                     
-                    adapters[adapter_key] = HDF5Adapter.from_uris(
+                    # For S3, we need to use fsspec
+                    s3_uri = f"s3://{bucket_name}/{key}"
+                    future = executor.submit(
+                        HDF5Adapter.from_uris,
                         s3_uri,
-                        storage_options={
-                            'key': access_key,
-                            'secret': secret_key,
-                            'client_kwargs': {'endpoint_url': minio_endpoint}
-                        }
+                        storage_options=storage_options
                     )
-                    print(f"  ✓ Loaded: {adapter_key} -> {s3_uri}")
-                except Exception as e:
-                    print(f"  ⚠ Failed to load {s3_uri}: {e}")
+                    pending.append((adapter_key, s3_uri, future))
                     
-    except Exception as e:
-        print(f"Error listing S3 bucket: {e}")
+        except Exception as e:
+            print(f"Error listing S3 bucket: {e}")
+        
+        for adapter_key, s3_uri, future in pending:
+            try:
+                adapters[adapter_key] = future.result()
+                print(f"  ✓ Loaded: {adapter_key} -> {s3_uri}")
+            except Exception as e:
+                print(f"  ⚠ Failed to load {s3_uri}: {e}")
     
     print(f"\n✓ Created catalog with {len(adapters)} entries from S3")
     return MapAdapter(adapters)
@@ -239,15 +284,26 @@ def create_demo_catalog() -> MapAdapter:
     
     This is useful for testing the Tiled setup without real HDF5 files.
     """
+    import dask
+    import dask.array as da
     import numpy as np
     from tiled.adapters.array import ArrayAdapter
     from tiled.adapters.dataframe import DataFrameAdapter
     
-    # Create sample array data
-    sample_array = np.random.rand(100, 100)
+    def generate_array():
+        return np.random.default_rng(DEMO_SEED).random(DEMO_ARRAY_SHAPE)
+    
+    # Sample array data is only generated when a client reads it; a fixed
+    # seed keeps the demo data reproducible across restarts
+    sample_array = da.from_delayed(
+        dask.delayed(generate_array)(),
+        shape=DEMO_ARRAY_SHAPE,
+        dtype=np.float64,
+    )
+    rng = np.random.default_rng(DEMO_SEED + 1)
     sample_df = pd.DataFrame({
         'time': pd.date_range('2024-01-01', periods=100, freq='1min'),
-        'intensity': np.random.rand(100) * 1000,
+        'intensity': rng.random(100) * 1000,
         'wavelength': np.linspace(0.5, 10.0, 100),
     })
     
@@ -266,8 +322,8 @@ def create_demo_catalog() -> MapAdapter:
     return MapAdapter(adapters)
 
 
-def main():
-    """Main entry point for the Tiled server."""
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command-line parser for the Tiled server."""
     parser = argparse.ArgumentParser(
         description='Start Tiled server for serving HDF5/NeXus data'
     )
@@ -305,6 +361,18 @@ def main():
         default=DEFAULT_PORT,
         help=f'Port to bind to (default: {DEFAULT_PORT})'
     )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='Number of uvicorn worker processes (default: CPU count, 1 with --reload)'
+    )
+    parser.add_argument(
+        '--limit-concurrency',
+        type=int,
+        default=None,
+        help='Maximum concurrent connections per worker before returning 503'
+    )
     parser.add_argument(
         '--reload',
         action='store_true',
@@ -316,36 +384,38 @@ def main():
         help='Allow public access (no authentication)'
     )
     
-    args = parser.parse_args()
-    
-    print("="*60)
-    print("TILED DATA SERVER")
-    print("="*60)
+    return parser
+
+
+def resolve_catalog_source(args: argparse.Namespace) -> Optional[Callable[[], MapAdapter]]:
+    """
+    Validate the requested data source and return a function that builds its catalog.
     
-    # Create catalog based on source
+    Returns None (after printing the reason) if no usable source was given.
+    """
     if args.data_dir:
         data_dir = Path(args.data_dir).expanduser()
         if not data_dir.exists():
             print(f"Error: Directory not found: {data_dir}")
-            return 1
+            return None
         print(f"Loading HDF5 files from: {data_dir}")
-        catalog = create_local_catalog(data_dir)
+        return partial(create_local_catalog, data_dir)
         
     elif args.catalog:
         catalog_path = Path(args.catalog).expanduser()
         if not catalog_path.exists():
             print(f"Error: Catalog file not found: {catalog_path}")
-            return 1
+            return None
         print(f"Loading catalog from: {catalog_path}")
-        catalog = create_catalog_from_parquet(catalog_path)
+        return partial(create_catalog_from_parquet, catalog_path)
         
     elif args.s3:
         print("Loading HDF5 files from MinIO S3...")
-        catalog = create_s3_catalog()
+        return create_s3_catalog
         
     elif args.demo:
         print("Creating demo catalog with sample data...")
-        catalog = create_demo_catalog()
+        return create_demo_catalog
         
     else:
         print("No data source specified. Use --help for options.")
@@ -353,28 +423,77 @@ def main():
         print("  python serve_tiled.py --demo")
         print("  python serve_tiled.py --data-dir ~/data/expt11/reduced")
         print("  python serve_tiled.py --catalog ./output/hdf5_metadata.parquet")
+        return None
+
+
+def build_tiled_app(catalog: MapAdapter):
+    """Build the Tiled app with public access."""
+    # Configure authentication for public access
+    from tiled.config import Authentication
+    authentication = Authentication(allow_anonymous_access=True)
+    
+    return build_app(catalog, authentication=authentication)
+
+
+def create_app():
+    """
+    App factory used by multi-worker uvicorn.
+    
+    Each worker process rebuilds the catalog from the command-line arguments
+    that main() stored in the environment.
+    """
+    args = build_parser().parse_args(json.loads(os.environ[WORKER_ARGV_ENV]))
+    load_catalog = resolve_catalog_source(args)
+    if load_catalog is None:
+        raise RuntimeError("No usable Tiled data source in worker arguments")
+    return build_tiled_app(load_catalog())
+
+
+def main():
+    """Main entry point for the Tiled server."""
+    args = build_parser().parse_args()
+    
+    print("="*60)
+    print("TILED DATA SERVER")
+    print("="*60)
+    
+    # Validate the data source before starting any workers
+    load_catalog = resolve_catalog_source(args)
+    if load_catalog is None:
         return 1
     
+    # --reload only works with a single worker
+    workers = 1 if args.reload else (args.workers or os.cpu_count() or 1)
+    
     # Build and run the Tiled app
-    print(f"\nStarting Tiled server on http://{args.host}:{args.port}")
+    print(f"\nStarting Tiled server on http://{args.host}:{args.port} ({workers} worker(s))")
     print(f"Web UI available at: http://{args.host}:{args.port}/ui")
     print(f"API available at:    http://{args.host}:{args.port}/api/v1")
     print("\nPress Ctrl+C to stop the server")
     print("="*60 + "\n")
     
-    # Configure authentication for public access
-    from tiled.config import Authentication
-    authentication = Authentication(allow_anonymous_access=True)
-    
-    # Build the Tiled app with public access
-    app = build_app(catalog, authentication=authentication)
-    
-    uvicorn.run(
-        app,
-        host=args.host,
-        port=args.port,
-        reload=args.reload,
-    )
+    if workers == 1:
+        uvicorn.run(
+            build_tiled_app(load_catalog()),
+            host=args.host,
+            port=args.port,
+            reload=args.reload,
+            limit_concurrency=args.limit_concurrency,
+        )
+    else:
+        # Worker processes import this module and build their own app, so
+        # pass the arguments through the environment. uvicorn's default
+        # loop/http settings already pick uvloop and httptools when installed.
+        os.environ[WORKER_ARGV_ENV] = json.dumps(sys.argv[1:])
+        uvicorn.run(
+            f"{Path(__file__).stem}:create_app",
+            factory=True,
+            app_dir=str(Path(__file__).resolve().parent),
+            host=args.host,
+            port=args.port,
+            workers=workers,
+            limit_concurrency=args.limit_concurrency,
+        )
     
     return 0
 
@@ -10,20 +10,57 @@ Usage:
 """
 
 import argparse
+import hashlib
 import json
+import logging
 import os
+import random
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from urllib3.util.retry import Retry
 from dotenv import load_dotenv
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
+try:
+    import orjson
+    
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+    
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+    
+    loads = json.loads
+
 # Configuration from environment
 DREMIO_HOST = os.getenv("DREMIO_HOST", "localhost")
 DREMIO_PORT = os.getenv("DREMIO_UI_PORT", "9047")
 DREMIO_URL = f"http://{DREMIO_HOST}:{DREMIO_PORT}"
+DREMIO_FLIGHT_PORT = os.getenv("DREMIO_FLIGHT_PORT", "32010")
+LOGIN_URL = f"{DREMIO_URL}/apiv2/login"
+
+# Auth tokens are cached on disk (mode 0600) so repeated runs skip the login
+TOKEN_CACHE_PATH = Path(
+    os.getenv("DREMIO_TOKEN_CACHE", "~/.cache/lakehouse/dremio_token.json")
+).expanduser()
+TOKEN_TTL = 23 * 3600
+TOKEN_MIN_REMAINING = 60
+
+# Hash of the last successfully applied source config, so unchanged reruns
+# skip the create call; expires so config drift is eventually re-checked
+SOURCE_CACHE_PATH = TOKEN_CACHE_PATH.parent / "dremio_source.json"
+SOURCE_CACHE_TTL = 3600
 
 # Nessie/MinIO configuration (for Dremio to connect internally via Docker network)
 NESSIE_INTERNAL_URL = "http://nessie:19120/api/v2"
@@ -31,181 +68,404 @@ MINIO_INTERNAL_ENDPOINT = "minio:9000"
 AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY_ID", "admin")
 AWS_SECRET_KEY = os.getenv("AWS_SECRET_ACCESS_KEY", "password")
 
+# Nessie source configuration for Dremio; only "name" varies per source
+NESSIE_SOURCE_TEMPLATE = {
+    "entityType": "source",
+    "type": "NESSIE",
+    "config": {
+        "nessieEndpoint": NESSIE_INTERNAL_URL,
+        "nessieAuthType": "NONE",
+        "credentialType": "ACCESS_KEY",
+        "awsAccessKey": AWS_ACCESS_KEY,
+        "awsAccessSecret": AWS_SECRET_KEY,
+        "awsRootPath": "/warehouse",
+        "secure": False,
+        "propertyList": [
+            {"name": "fs.s3a.path.style.access", "value": "true"},
+            {"name": "fs.s3a.endpoint", "value": MINIO_INTERNAL_ENDPOINT},
+            {"name": "dremio.s3.compat", "value": "true"}
+        ]
+    }
+}
+
+# Per-request timeout (seconds) so a hung Dremio can't block the script forever
+REQUEST_TIMEOUT = 30.0
+
+# Job polling: exponential backoff with full jitter, capped per sleep
+POLL_INITIAL_DELAY = 0.1
+POLL_MAX_DELAY = 5.0
+QUERY_MAX_WAIT = 30.0
+
+# Readiness polling after creating a source
+SOURCE_READY_TIMEOUT = 10.0
+SOURCE_READY_INTERVAL = 0.2
+
+# In-process cache of source name -> (catalog id, expiry on the monotonic clock)
+SOURCE_ID_TTL = 300.0
+_source_ids = {}
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default timeout to every request."""
+    
+    def __init__(self, *args, timeout: float = REQUEST_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+    
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_session() -> requests.Session:
+    """
+    Create a pooled HTTP session so every Dremio call reuses keep-alive connections.
+    
+    Connection errors and transient 429/5xx responses are retried with
+    exponential backoff, honouring Retry-After, and every request times out
+    after REQUEST_TIMEOUT seconds.
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=5,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD", "POST"),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(max_retries=retry, pool_connections=4, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Content-Type": "application/json"})
+    return session
+
+
+SESSION = create_session()
+
 
 def authenticate(username: str, password: str) -> str:
     """Authenticate with Dremio and return auth token."""
-    print(f"Authenticating with Dremio at {DREMIO_URL}...")
+    log.info("Authenticating with Dremio at %s...", DREMIO_URL)
     
-    response = requests.post(
-        f"{DREMIO_URL}/apiv2/login",
-        headers={"Content-Type": "application/json"},
-        json={"userName": username, "password": password}
+    response = SESSION.post(
+        LOGIN_URL,
+        data=dumps({"userName": username, "password": password})
     )
     
     if response.status_code != 200:
-        print(f"Authentication failed: {response.status_code}")
-        print(response.text)
+        log.error("Authentication failed: %s\n%s", response.status_code, response.text)
         sys.exit(1)
     
-    token = response.json().get("token")
-    print("✓ Authentication successful")
+    token = loads(response.content).get("token")
+    log.info("✓ Authentication successful")
     return token
 
 
-def get_headers(token: str) -> dict:
-    """Return headers with authentication token."""
-    return {
-        "Authorization": f"_dremio{token}",
-        "Content-Type": "application/json"
-    }
+def load_cached_token(username: str):
+    """Return a cached token for this server and user if it is not about to expire."""
+    try:
+        cached = json.loads(TOKEN_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+    
+    if (cached.get("url") == DREMIO_URL
+            and cached.get("username") == username
+            and cached.get("expires_at", 0) > time.time() + TOKEN_MIN_REMAINING):
+        return cached.get("token")
+    return None
 
 
-def check_source_exists(token: str, source_name: str) -> bool:
-    """Check if a data source already exists."""
-    response = requests.get(
-        f"{DREMIO_URL}/api/v3/catalog/by-path/{source_name}",
-        headers=get_headers(token)
-    )
+def write_private_json(path: Path, data: dict):
+    """Write a JSON cache file readable only by the current user."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f)
+    os.chmod(path, 0o600)
+
+
+def save_cached_token(username: str, token: str):
+    """Write the token cache, readable only by the current user."""
+    write_private_json(TOKEN_CACHE_PATH, {
+        "url": DREMIO_URL,
+        "username": username,
+        "token": token,
+        "expires_at": time.time() + TOKEN_TTL,
+    })
+
+
+def source_config_key(source_config: dict) -> str:
+    """SHA256 of the Dremio server plus the full source config."""
+    canonical = json.dumps(source_config, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{DREMIO_URL}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def source_config_unchanged(config_key: str) -> bool:
+    """True if this exact config was applied successfully within SOURCE_CACHE_TTL."""
+    try:
+        cached = json.loads(SOURCE_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return False
+    return cached.get("key") == config_key and cached.get("ts", 0) > time.time() - SOURCE_CACHE_TTL
+
+
+class DremioTokenAuth(AuthBase):
+    """
+    Session auth that uses a cached Dremio token.
+    
+    A 401 response triggers one fresh login, and the request is retried with
+    the new token.
+    """
+    
+    def __init__(self, username: str, password: str):
+        self.username = username
+        self.password = password
+        self.token = load_cached_token(username)
+    
+    def login(self) -> str:
+        self.token = authenticate(self.username, self.password)
+        save_cached_token(self.username, self.token)
+        return self.token
+    
+    def __call__(self, request):
+        if request.url == LOGIN_URL:
+            return request
+        request.headers["Authorization"] = f"_dremio{self.token}"
+        request.register_hook("response", self.handle_401)
+        return request
+    
+    def handle_401(self, response, **kwargs):
+        if response.status_code != 401:
+            return response
+        
+        log.info("Cached Dremio token rejected, re-authenticating...")
+        self.login()
+        
+        # Release the connection, then resend once without this hook
+        response.content
+        response.close()
+        retry = response.request.copy()
+        retry.hooks = {"response": []}
+        retry.headers["Authorization"] = f"_dremio{self.token}"
+        new_response = response.connection.send(retry, **kwargs)
+        new_response.history.append(response)
+        new_response.request = retry
+        return new_response
+
+
+def check_source_exists(source_name: str) -> bool:
+    """Check if a data source already exists (status only, no body download)."""
+    url = f"{DREMIO_URL}/api/v3/catalog/by-path/{source_name}"
+    response = SESSION.head(url, allow_redirects=False)
+    
+    if response.status_code in (405, 501):
+        # HEAD not supported: fall back to GET without reading the body
+        with SESSION.get(url, stream=True) as response:
+            return response.status_code == 200
     return response.status_code == 200
 
 
-def create_nessie_source(token: str, source_name: str = "lakehouse") -> bool:
-    """Create a Nessie data source connected to MinIO."""
+def cache_source_id(source_name: str, source_id: str):
+    """Remember the catalog id of a source for SOURCE_ID_TTL seconds."""
+    _source_ids[source_name] = (source_id, time.monotonic() + SOURCE_ID_TTL)
+
+
+def get_source_id(source_name: str):
+    """Return the catalog id of a source, looking it up only on a cache miss."""
+    cached = _source_ids.get(source_name)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
     
-    if check_source_exists(token, source_name):
-        print(f"✓ Data source '{source_name}' already exists")
-        return True
+    response = SESSION.get(
+        f"{DREMIO_URL}/api/v3/catalog/by-path/{source_name}"
+    )
     
-    print(f"Creating Nessie data source '{source_name}'...")
+    if response.status_code != 200:
+        log.warning("Source not found: %s", response.status_code)
+        return None
     
+    source_id = loads(response.content).get("id")
+    cache_source_id(source_name, source_id)
+    return source_id
+
+
+def wait_ready(source_name: str, timeout: float = SOURCE_READY_TIMEOUT) -> bool:
+    """Poll the catalog until a source is visible, up to `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check_source_exists(source_name):
+            return True
+        time.sleep(SOURCE_READY_INTERVAL)
+    return False
+
+
+def create_nessie_source(source_name: str = "lakehouse") -> bool:
+    """Create a Nessie data source connected to MinIO."""
     # Nessie source configuration for Dremio
-    source_config = {
-        "entityType": "source",
-        "name": source_name,
-        "type": "NESSIE",
-        "config": {
-            "nessieEndpoint": NESSIE_INTERNAL_URL,
-            "nessieAuthType": "NONE",
-            "credentialType": "ACCESS_KEY",
-            "awsAccessKey": AWS_ACCESS_KEY,
-            "awsAccessSecret": AWS_SECRET_KEY,
-            "awsRootPath": "/warehouse",
-            "secure": False,
-            "propertyList": [
-                {"name": "fs.s3a.path.style.access", "value": "true"},
-                {"name": "fs.s3a.endpoint", "value": MINIO_INTERNAL_ENDPOINT},
-                {"name": "dremio.s3.compat", "value": "true"}
-            ]
-        }
-    }
+    source_config = {**NESSIE_SOURCE_TEMPLATE, "name": source_name}
     
-    response = requests.post(
+    # Skip the create call when this exact config was applied recently and
+    # the source is still there
+    config_key = source_config_key(source_config)
+    if source_config_unchanged(config_key) and check_source_exists(source_name):
+        log.info("✓ Data source '%s' unchanged since last run", source_name)
+        return True
+    
+    log.info("Creating Nessie data source '%s'...", source_name)
+    response = SESSION.post(
         f"{DREMIO_URL}/api/v3/catalog",
-        headers=get_headers(token),
-        json=source_config
+        data=dumps(source_config)
     )
     
-    if response.status_code in [200, 201]:
-        print(f"✓ Created Nessie data source '{source_name}'")
+    # POST unconditionally: Dremio answers 409 Conflict when the source already
+    # exists, which saves an existence check on every run
+    if response.status_code == 409 or (
+        response.status_code == 400 and "already exists" in response.text.lower()
+    ):
+        log.info("✓ Data source '%s' already exists", source_name)
+        write_private_json(SOURCE_CACHE_PATH, {"key": config_key, "ts": time.time()})
+        return True
+    elif response.status_code in [200, 201]:
+        log.info("✓ Created Nessie data source '%s'", source_name)
+        # The created entity carries its id, so a later refresh needs no lookup
+        source_id = loads(response.content).get("id")
+        if source_id:
+            cache_source_id(source_name, source_id)
+        write_private_json(SOURCE_CACHE_PATH, {"key": config_key, "ts": time.time()})
         return True
     else:
-        print(f"Failed to create data source: {response.status_code}")
-        print(response.text)
+        log.error("Failed to create data source: %s\n%s", response.status_code, response.text)
         return False
 
 
-def refresh_source(token: str, source_name: str) -> bool:
+def refresh_source(source_name: str) -> bool:
     """Refresh metadata for a data source."""
-    print(f"Refreshing metadata for '{source_name}'...")
+    log.info("Refreshing metadata for '%s'...", source_name)
     
     # First get the source ID
-    response = requests.get(
-        f"{DREMIO_URL}/api/v3/catalog/by-path/{source_name}",
-        headers=get_headers(token)
-    )
-    
-    if response.status_code != 200:
-        print(f"Source not found: {response.status_code}")
+    source_id = get_source_id(source_name)
+    if source_id is None:
         return False
     
-    source_id = response.json().get("id")
-    
     # Trigger refresh
-    response = requests.post(
-        f"{DREMIO_URL}/api/v3/catalog/{source_id}/refresh",
-        headers=get_headers(token)
+    response = SESSION.post(
+        f"{DREMIO_URL}/api/v3/catalog/{source_id}/refresh"
     )
     
     if response.status_code in [200, 204]:
-        print(f"✓ Metadata refresh triggered for '{source_name}'")
+        log.info("✓ Metadata refresh triggered for '%s'", source_name)
         return True
     else:
-        print(f"Refresh failed: {response.status_code}")
+        log.error("Refresh failed: %s", response.status_code)
         return False
 
 
-def run_query(token: str, sql: str) -> dict:
-    """Run a SQL query in Dremio."""
-    print(f"Running query: {sql[:50]}...")
+def run_query(sql: str, max_wait: float = QUERY_MAX_WAIT) -> dict:
+    """Run a SQL query in Dremio, waiting up to `max_wait` seconds for it to finish."""
+    log.info("Running query: %s...", sql[:50])
     
     # Submit job
-    response = requests.post(
+    response = SESSION.post(
         f"{DREMIO_URL}/api/v3/sql",
-        headers=get_headers(token),
-        json={"sql": sql}
+        data=dumps({"sql": sql})
     )
     
     if response.status_code != 200:
-        print(f"Query submission failed: {response.status_code}")
-        print(response.text)
+        log.error("Query submission failed: %s\n%s", response.status_code, response.text)
         return {}
     
-    job = response.json()
+    job = loads(response.content)
     job_id = job.get("id")
     
-    # Poll for job completion
-    for _ in range(30):
-        response = requests.get(
-            f"{DREMIO_URL}/api/v3/job/{job_id}",
-            headers=get_headers(token)
+    # Poll for job completion, backing off so short jobs return quickly and
+    # long jobs don't hammer the job API
+    deadline = time.monotonic() + max_wait
+    attempt = 0
+    while time.monotonic() < deadline:
+        response = SESSION.get(
+            f"{DREMIO_URL}/api/v3/job/{job_id}"
         )
         
         if response.status_code != 200:
             break
             
-        status = response.json()
+        status = loads(response.content)
         job_state = status.get("jobState")
+        log.debug("Job %s state: %s (poll %d)", job_id, job_state, attempt + 1)
         
         if job_state == "COMPLETED":
-            print("✓ Query completed")
+            log.info("✓ Query completed")
             return status
         elif job_state in ["FAILED", "CANCELED"]:
-            print(f"Query {job_state}")
+            log.warning("Query %s", job_state)
             return status
         
-        time.sleep(1)
+        delay = random.uniform(0, min(POLL_MAX_DELAY, POLL_INITIAL_DELAY * 2 ** attempt))
+        time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        attempt += 1
     
     return {}
 
 
-def test_connection(token: str, source_name: str) -> bool:
-    """Test the connection by running a simple query."""
-    print("\nTesting connection with sample query...")
+def run_flight_query(username: str, password: str, sql: str):
+    """
+    Run a SQL query over Arrow Flight and return the result as an Arrow table.
+    
+    Flight returns results synchronously, so there is no job polling.
+    """
+    from pyarrow import flight
+    
+    log.info("Running query via Arrow Flight: %s...", sql[:50])
+    client = flight.FlightClient(f"grpc+tcp://{DREMIO_HOST}:{DREMIO_FLIGHT_PORT}")
+    try:
+        options = flight.FlightCallOptions(
+            headers=[client.authenticate_basic_token(username, password)]
+        )
+        info = client.get_flight_info(flight.FlightDescriptor.for_command(sql), options)
+        table = client.do_get(info.endpoints[0].ticket, options).read_all()
+    finally:
+        client.close()
+    
+    log.info("✓ Query completed")
+    return table
+
+
+def test_connection(
+    source_name: str,
+    max_wait: float = QUERY_MAX_WAIT,
+    flight_credentials: tuple = None
+) -> bool:
+    """
+    Test the connection by running a simple query.
+    
+    When `flight_credentials` (username, password) is given the query runs over
+    Arrow Flight, falling back to the REST job API if Flight fails.
+    """
+    log.info("\nTesting connection with sample query...")
     
     # Try to query the orders table (path: source.namespace.table)
-    result = run_query(
-        token, 
-        f"SELECT COUNT(*) as total FROM {source_name}.structured_data.orders"
-    )
+    sql = f"SELECT COUNT(*) as total FROM {source_name}.structured_data.orders"
+    
+    if flight_credentials:
+        try:
+            table = run_flight_query(*flight_credentials, sql)
+            log.info("✓ Found %s rows in orders table", table.column(0)[0].as_py())
+            return True
+        except Exception as e:
+            log.warning("⚠ Arrow Flight query failed (%s); falling back to REST", e)
+    
+    result = run_query(sql, max_wait=max_wait)
     
     if result.get("jobState") == "COMPLETED":
         row_count = result.get("rowCount", 0)
-        print(f"✓ Found {row_count} rows in orders table")
+        log.info("✓ Found %s rows in orders table", row_count)
         return True
     else:
-        print("Query did not complete successfully")
-        print("This is normal if the Iceberg table hasn't been created yet.")
-        print("Run the bridge_ravendb.py script first to create Iceberg tables.")
+        log.warning("Query did not complete successfully")
+        log.warning("This is normal if the Iceberg table hasn't been created yet.")
+        log.warning("Run the bridge_ravendb.py script first to create Iceberg tables.")
         return False
 
 
@@ -216,54 +476,67 @@ def main():
     parser.add_argument("--source-name", "-s", default="lakehouse", help="Data source name")
     parser.add_argument("--test-only", action="store_true", help="Only test connection")
     parser.add_argument("--refresh", "-r", action="store_true", help="Only refresh metadata (useful after Spark bridge jobs)")
+    parser.add_argument("--use-flight", action="store_true", help=f"Run the test query over Arrow Flight (port {DREMIO_FLIGHT_PORT}) instead of polling the REST job API")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="Logging verbosity (default: INFO)")
+    parser.add_argument("--max-wait", type=float, default=QUERY_MAX_WAIT, help=f"Seconds to wait for the test query (default: {QUERY_MAX_WAIT:g})")
     args = parser.parse_args()
     
+    logging.basicConfig(level=args.log_level, format="%(message)s")
+    
     # Get credentials from args or environment
     username = args.username or os.getenv("DREMIO_USER", "admin")
     password = args.password or os.getenv("DREMIO_PASSWORD")
     
     if not password:
-        print("Error: Dremio password required. Either:")
-        print("  - Pass via --password / -p argument")
-        print("  - Set DREMIO_PASSWORD in .env file")
+        log.error("Error: Dremio password required. Either:")
+        log.error("  - Pass via --password / -p argument")
+        log.error("  - Set DREMIO_PASSWORD in .env file")
         sys.exit(1)
     
-    # Authenticate
-    token = authenticate(username, password)
+    # Authenticate, reusing a cached token when one is still valid
+    auth = DremioTokenAuth(username, password)
+    if auth.token:
+        log.info("✓ Using cached Dremio token (%s)", TOKEN_CACHE_PATH)
+    else:
+        auth.login()
+    SESSION.auth = auth
+    flight_credentials = (username, password) if args.use_flight else None
     
     if args.test_only:
-        test_connection(token, args.source_name)
+        test_connection(args.source_name, args.max_wait, flight_credentials)
         return
     
     if args.refresh:
         # Just refresh metadata and exit
-        refresh_source(token, args.source_name)
-        print("\n✓ Metadata refresh triggered. Tables should now be visible in Dremio.")
+        refresh_source(args.source_name)
+        log.info("\n✓ Metadata refresh triggered. Tables should now be visible in Dremio.")
         return
     
     # Create data source
-    if create_nessie_source(token, args.source_name):
-        # Give it a moment to initialize
-        time.sleep(2)
-        
-        # Refresh metadata
-        refresh_source(token, args.source_name)
+    if create_nessie_source(args.source_name):
+        # Wait until the source is visible in the catalog
+        if not wait_ready(args.source_name):
+            log.warning("⚠ Source '%s' not visible after %gs, continuing anyway", args.source_name, SOURCE_READY_TIMEOUT)
         
-        # Wait for refresh
-        time.sleep(3)
-        
-        # Test connection
-        test_connection(token, args.source_name)
-    
-    print("\n" + "="*50)
-    print("Dremio Setup Complete!")
-    print("="*50)
-    print(f"\nDremio UI: {DREMIO_URL}")
-    print(f"Data Source: {args.source_name}")
-    print("\nYou can now query Iceberg tables via:")
-    print(f"  - Dremio UI SQL Runner")
-    print(f"  - ODBC/JDBC on port 31010")
-    print(f"  - Arrow Flight on port 32010")
+        # Refresh metadata and test the connection concurrently; the refresh
+        # runs asynchronously on Dremio's side, so there is nothing to wait for
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            refresh = executor.submit(refresh_source, args.source_name)
+            test = executor.submit(
+                test_connection, args.source_name, args.max_wait, flight_credentials
+            )
+            refresh.result()
+            test.result()
+    
+    log.info("\n" + "="*50)
+    log.info("Dremio Setup Complete!")
+    log.info("="*50)
+    log.info("\nDremio UI: %s", DREMIO_URL)
+    log.info("Data Source: %s", args.source_name)
+    log.info("\nYou can now query Iceberg tables via:")
+    log.info("  - Dremio UI SQL Runner")
+    log.info("  - ODBC/JDBC on port 31010")
+    log.info("  - Arrow Flight on port %s", DREMIO_FLIGHT_PORT)
 
 
 if __name__ == "__main__":